@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ApprovalHub.settings')
+# Read by ApprovalHub.database to default DB_CONN_MAX_AGE to 0
+os.environ.setdefault('SERVER_GATEWAY_INTERFACE', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,14 @@
+"""
+Root URL configuration for requests served over ASGI.
+
+Mirrors ApprovalHub/urls.py but routes the credit_approval read endpoints
+to their async views; see credit_approval.middleware.AsyncRoutingMiddleware.
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('',include('credit_approval.async_urls')),
+]
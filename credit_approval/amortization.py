@@ -0,0 +1,120 @@
+# credit_approval/amortization.py
+import numpy as np
+
+# Months generated per block when streaming a schedule
+SCHEDULE_BLOCK_SIZE = 240
+
+
+def level_installments(loan_amounts, interest_rates, tenures):
+    """
+    Level monthly payment that pays each loan off over its tenure.
+
+    Unlike ``loan_eligibility.amortized_installments`` (which mirrors the API's
+    quoted EMI), a zero rate gives ``amount / tenure`` rather than 0; a zero
+    tenure gives 0.
+    """
+    loan_amounts = np.asarray(loan_amounts, dtype=np.float64)
+    tenures = np.asarray(tenures, dtype=np.float64)
+    rates = np.asarray(interest_rates, dtype=np.float64) / 12 / 100
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        amortizing = loan_amounts * rates / (1 - (1 + rates) ** -tenures)
+        flat = loan_amounts / tenures
+    installments = np.where(rates == 0, flat, amortizing)
+    return np.where(tenures > 0, installments, 0.0)
+
+
+def remaining_balances(loan_amounts, interest_rates, installments, payments_made):
+    """
+    Principal still owed after ``payments_made`` level payments, per loan.
+
+    Uses the closed form ``P(1+r)^k - E((1+r)^k - 1)/r`` so any mix of loans
+    and payment counts is evaluated in one pass. Never negative.
+    """
+    loan_amounts = np.asarray(loan_amounts, dtype=np.float64)
+    installments = np.asarray(installments, dtype=np.float64)
+    payments_made = np.asarray(payments_made, dtype=np.float64)
+    rates = np.asarray(interest_rates, dtype=np.float64) / 12 / 100
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = (1 + rates) ** payments_made
+        amortizing = loan_amounts * growth - installments * (growth - 1) / rates
+    balances = np.where(rates == 0, loan_amounts - installments * payments_made, amortizing)
+    return np.maximum(balances, 0.0)
+
+
+def schedule_block(loan_amount, interest_rate, tenure, installment, first_month, last_month):
+    """
+    Rows ``first_month..last_month`` (1-based, inclusive) of a loan's schedule.
+
+    Returns a dict of equal-length arrays: ``month``, ``payment``,
+    ``interest``, ``principal`` and ``balance`` (after the payment). The final
+    month absorbs rounding so the balance ends at exactly zero.
+    """
+    months = np.arange(first_month, last_month + 1, dtype=np.float64)
+    opening = remaining_balances(loan_amount, interest_rate, installment, months - 1)
+    interest = opening * (interest_rate / 12 / 100)
+    principal = np.minimum(installment - interest, opening)
+    if last_month == tenure and len(principal):
+        principal[-1] = opening[-1]
+    return {
+        'month': months.astype(np.int64),
+        'payment': principal + interest,
+        'interest': interest,
+        'principal': principal,
+        'balance': opening - principal,
+    }
+
+
+def amortization_schedule(loan_amount, interest_rate, tenure, installment=None):
+    """Full month-by-month schedule of one loan as a dict of arrays."""
+    if installment is None:
+        installment = float(level_installments([loan_amount], [interest_rate], [tenure])[0])
+    # No months at all for a zero or negative tenure
+    return schedule_block(loan_amount, interest_rate, tenure, installment, 1, max(tenure, 0))
+
+
+def iter_schedule_blocks(loan_amount, interest_rate, tenure, installment=None, block_size=SCHEDULE_BLOCK_SIZE):
+    """Yield the schedule in blocks of ``block_size`` months, for streaming."""
+    if installment is None:
+        installment = float(level_installments([loan_amount], [interest_rate], [tenure])[0])
+    for first in range(1, tenure + 1, block_size):
+        yield schedule_block(loan_amount, interest_rate, tenure, installment, first, min(first + block_size - 1, tenure))
+
+
+def months_elapsed(start_dates, as_of):
+    """
+    Whole months between each start date and ``as_of`` (0 for missing or
+    future dates). ``start_dates`` is any array-like of dates or ``None``.
+    """
+    starts = np.array(start_dates, dtype='datetime64[D]')
+    as_of = np.datetime64(as_of, 'D')
+    start_months = starts.astype('datetime64[M]')
+    months = (as_of.astype('datetime64[M]') - start_months).astype(np.int64)
+    # A month only counts once its day of month has been reached; like
+    # relativedelta, a start on the 31st falls due on the last day of shorter months
+    start_days = (starts - start_months.astype('datetime64[D]')).astype(np.int64)
+    as_of_month = as_of.astype('datetime64[M]')
+    as_of_day = (as_of - as_of_month.astype('datetime64[D]')).astype(np.int64)
+    last_day = ((as_of_month + 1).astype('datetime64[D]') - as_of_month.astype('datetime64[D]')).astype(np.int64) - 1
+    months = months - (as_of_day < np.minimum(start_days, last_day))
+    return np.where(np.isnat(starts), 0, np.maximum(months, 0))
+
+
+def outstanding_balances(loan_amounts, interest_rates, tenures, start_dates, as_of, payments_made=None):
+    """
+    Scheduled outstanding principal of many loans on ``as_of``, in one pass.
+
+    Returns ``(balances, payments_due)`` arrays; ``payments_due`` is the number
+    of installments that have fallen due, capped at the tenure. A loan with
+    more ``payments_made`` (installments actually paid) than have fallen due
+    was paid ahead, and its balance counts those payments instead.
+    """
+    tenures = np.asarray(tenures, dtype=np.int64)
+    payments_due = np.minimum(months_elapsed(start_dates, as_of), np.maximum(tenures, 0))
+    payments = payments_due
+    if payments_made is not None:
+        payments = np.minimum(np.maximum(payments_due, np.asarray(payments_made, dtype=np.int64)), np.maximum(tenures, 0))
+    installments = level_installments(loan_amounts, interest_rates, tenures)
+    balances = remaining_balances(loan_amounts, interest_rates, installments, payments)
+    return np.where(payments >= tenures, 0.0, balances), payments_due
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CreditApprovalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'credit_approval'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,18 @@
+# credit_approval/async_urls.py
+# Same routes and names as urls.py, with the async read views swapped in.
+# Selected per request by AsyncRoutingMiddleware when serving over ASGI.
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    'view_loan_by_loan_id': async_views.view_loan_by_loan_id,
+    'view_loans_by_customer': async_views.view_loans_by_customer,
+    'check_eligibility': async_views.check_eligibility,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS.get(pattern.name, pattern.callback), name=pattern.name)
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,113 @@
+# credit_approval/async_views.py
+#
+# Async ORM versions of the read endpoints. DRF's @api_view cannot wrap a
+# coroutine, so these are plain Django views returning the same JSON bodies,
+# rendered by DRF's JSONRenderer so the bytes (and ETags) match too.
+# They are routed by async_urls.py, which AsyncRoutingMiddleware selects for
+# requests served over ASGI; WSGI keeps the views in views.py.
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.renderers import JSONRenderer
+
+from .cache import cached_response
+from .models import Customer, Loan
+from .querybudget import query_budget
+from .rendering import LOAN_DETAIL_COLUMNS, active_loan, loan_detail
+from .serializers import CheckEligibilityRequestSerializer
+from .services import active_loans_queryset, aget_credit_snapshot
+from .views import (
+    VIEW_LOANS_MAX_PAGE_SIZE,
+    ambiguous_loan_error,
+    evaluate_eligibility,
+    loan_lookup,
+    next_page_link,
+    parse_loans_page,
+    render_loans_chunk,
+)
+
+
+def json_response(data, status=200):
+    # Same compact bytes as a DRF Response; json.dumps would add spaces
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+@query_budget(1)
+@cached_response('loan', 'loan_id')
+@require_GET
+async def view_loan_by_loan_id(request, loan_id):
+    try:
+        row = await Loan.objects.values_list(*LOAN_DETAIL_COLUMNS).aget(**loan_lookup(request.GET, loan_id))
+    except ValueError:
+        return json_response({'error': 'customer_id must be an integer'}, status=400)
+    except Loan.DoesNotExist:
+        return json_response({'error': 'Loan not found'}, status=404)
+    except Loan.MultipleObjectsReturned:
+        return json_response(ambiguous_loan_error(loan_id), status=409)
+    return json_response(loan_detail(row))
+
+
+@query_budget(2)
+@cached_response('customer', 'customer_id')
+@require_GET
+async def view_loans_by_customer(request, customer_id):
+    loans = active_loans_queryset(customer_id)
+
+    if request.GET.get('stream') in ('1', 'true'):
+        if not await Customer.objects.filter(customer_id=customer_id).aexists():
+            return json_response({'error': 'Customer not found'}, status=404)
+        return StreamingHttpResponse(astream_loans_json(loans), content_type='application/json')
+
+    try:
+        page_size, after = parse_loans_page(request.GET)
+    except ValueError:
+        return json_response({'error': 'Invalid page_size or cursor'}, status=400)
+
+    if after is not None:
+        loans = loans.filter(id__gt=after)
+    page = [row async for row in loans[:page_size + 1]]
+
+    if not page and after is None and not await Customer.objects.filter(customer_id=customer_id).aexists():
+        return json_response({'error': 'Customer not found'}, status=404)
+
+    response = json_response(active_loan.many(page[:page_size]))
+    if len(page) > page_size:
+        response['Link'] = next_page_link(request, page[page_size - 1])
+    return response
+
+
+async def astream_loans_json(loans, chunk_size=VIEW_LOANS_MAX_PAGE_SIZE):
+    yield b'['
+    separator = b''
+    chunk = []
+    async for row in loans.aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield separator + render_loans_chunk(chunk)
+            separator = b','
+            chunk = []
+    if chunk:
+        yield separator + render_loans_chunk(chunk)
+    yield b']'
+
+
+@query_budget(3)
+@csrf_exempt
+@require_POST
+async def check_eligibility(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return json_response({'error': 'Request body must be JSON'}, status=400)
+
+    serializer = CheckEligibilityRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=400)
+
+    snapshot = await aget_credit_snapshot(serializer.validated_data['customer_id'])
+    # Scoring reads and fills the credit score cache, whose backend is sync
+    body = await sync_to_async(evaluate_eligibility)(serializer.validated_data, snapshot)
+    return json_response(body)
@@ -0,0 +1,495 @@
+# credit_approval/benchmarks.py
+import asyncio
+import json
+import math
+import queue
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max, Sum
+from django.test import AsyncClient, Client
+from rest_framework.renderers import JSONRenderer
+
+from .importers import analyze_tables, reset_sequences
+from .models import IDENTITY_FIELDS, Customer, Loan, identity_fingerprint, loan_status
+from .rendering import LOAN_DETAIL_COLUMNS, active_loan, loan_detail
+from .serializers import LoanDetailsCustomerSerializer, LoanDetailsSerializer
+
+FIRST_NAMES = ['Aaron', 'Abbey', 'Rohan', 'Priya', 'Karan', 'Meera', 'Vikram', 'Anita', 'Rahul', 'Sneha']
+LAST_NAMES = ['Sharma', 'Verma', 'Gupta', 'Iyer', 'Khan', 'Reddy', 'Nair', 'Das', 'Patel', 'Singh']
+
+
+def seed_dataset(customers=1000, loans=10000, seed=42, chunk_size=10000, progress=None):
+    """
+    Insert a deterministic synthetic portfolio of ``customers`` and ``loans``.
+
+    Rows are appended after the current maximum IDs so seeding can run on top
+    of existing data. Returns the list of new customer IDs.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    first_customer = (Customer.objects.aggregate(Max('customer_id'))['customer_id__max'] or 0) + 1
+    first_loan = (Loan.objects.aggregate(Max('loan_id'))['loan_id__max'] or 0) + 1
+    customer_ids = list(range(first_customer, first_customer + customers))
+
+    for start in range(0, customers, chunk_size):
+        batch = []
+        for customer_id in customer_ids[start:start + chunk_size]:
+            salary = rng.randrange(20000, 300000, 1000)
+            customer = Customer(
+                customer_id=customer_id,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                age=rng.randint(21, 60),
+                phone_number=rng.randint(6000000000, 9999999999),
+                monthly_salary=salary,
+                approved_limit=round(36 * salary / 100000) * 100000,
+            )
+            customer.identity_fingerprint = identity_fingerprint(*(getattr(customer, field) for field in IDENTITY_FIELDS))
+            batch.append(customer)
+        Customer.objects.bulk_create(batch, batch_size=chunk_size)
+
+    for start in range(0, loans, chunk_size):
+        batch = []
+        for offset in range(start, min(start + chunk_size, loans)):
+            tenure = rng.choice([6, 12, 24, 36, 60, 120])
+            amount = rng.randrange(10000, 1000000, 5000)
+            start_date = today - timedelta(days=rng.randint(0, 3650))
+            end_date = start_date + timedelta(days=30 * tenure)
+            batch.append(Loan(
+                customer_id_id=rng.choice(customer_ids),
+                loan_id=first_loan + offset,
+                loan_amount=amount,
+                tenure=tenure,
+                interest_rate=rng.randint(8, 18),
+                monthly_repayment=round(amount / tenure),
+                emis_paid_on_time=rng.randint(0, tenure),
+                start_date=start_date,
+                end_date=end_date,
+                status=loan_status(end_date, today),
+            ))
+        Loan.objects.bulk_create(batch, batch_size=chunk_size)
+        if progress is not None:
+            progress(start + len(batch))
+
+    reset_sequences()
+    analyze_tables()
+    return customer_ids
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile; samples need not be sorted
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def measure(fn, args_list):
+    """Call ``fn(*args)`` for each entry of ``args_list``; return latencies in ms."""
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(sum(samples) / len(samples), 3) if samples else 0.0,
+    }
+
+
+# Relative weight of each endpoint in a generated workload
+WORKLOAD_MIX = {
+    'register': 1,
+    'check_eligibility': 4,
+    'create_loan': 2,
+    'view_loans': 3,
+}
+
+# Read-heavy mix served by the async views under ASGI
+READ_MIX = {
+    'view_loan': 3,
+    'view_loans': 3,
+    'check_eligibility': 4,
+}
+
+# Latency metrics compared against a baseline; throughput is compared inversely
+REGRESSION_METRICS = ['p50_ms', 'p95_ms', 'p99_ms']
+
+
+def build_workload(customer_ids, requests=1000, mix=None, seed=0, loan_ids=None):
+    """
+    A deterministic list of API calls drawn from ``mix`` (endpoint -> weight).
+    ``view_loan`` calls need ``loan_ids``.
+
+    Each call is a dict with ``endpoint``, ``method``, ``path`` and ``body``
+    so it can be saved with :func:`save_workload` and replayed later.
+    """
+    rng = random.Random(seed)
+    mix = mix or WORKLOAD_MIX
+    endpoints = list(mix)
+    weights = [mix[endpoint] for endpoint in endpoints]
+
+    workload = []
+    for _ in range(requests):
+        endpoint = rng.choices(endpoints, weights)[0]
+        customer_id = rng.choice(customer_ids)
+        if endpoint == 'register':
+            call = ('POST', '/register/', {
+                'first_name': rng.choice(FIRST_NAMES),
+                'last_name': rng.choice(LAST_NAMES),
+                'age': rng.randint(21, 60),
+                'monthly_salary': rng.randrange(20000, 300000, 1000),
+                'phone_number': rng.randint(6000000000, 9999999999),
+            })
+        elif endpoint in ('check_eligibility', 'create_loan'):
+            path = '/check-eligibility/' if endpoint == 'check_eligibility' else '/create-loan/'
+            call = ('POST', path, {
+                'customer_id': customer_id,
+                'loan_amount': rng.randrange(10000, 1000000, 5000),
+                'interest_rate': rng.randint(8, 18),
+                'tenure': rng.choice([6, 12, 24, 36, 60]),
+            })
+        elif endpoint == 'view_loan':
+            call = ('GET', f'/view-loan/{rng.choice(loan_ids)}/', None)
+        else:
+            call = ('GET', f'/view-loans/{customer_id}/', None)
+        method, path, body = call
+        workload.append({'endpoint': endpoint, 'method': method, 'path': path, 'body': body})
+    return workload
+
+
+def save_workload(path, workload):
+    with open(path, 'w') as f:
+        for call in workload:
+            f.write(json.dumps(call) + '\n')
+
+
+def load_workload(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def allow_test_clients():
+    # The test clients send "Host: testserver"; the test runner allows it the
+    # same way when it sets up the test environment
+    if 'testserver' not in settings.ALLOWED_HOSTS:
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+
+class TestClientTransport:
+    """Sends calls in-process through Django's test client; one client per thread."""
+
+    def __init__(self):
+        allow_test_clients()
+        self._local = threading.local()
+
+    def __call__(self, call):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client()
+        if call['method'] == 'GET':
+            return client.get(call['path']).status_code
+        return client.generic(call['method'], call['path'], json.dumps(call['body']),
+                              content_type='application/json').status_code
+
+
+class AsyncClientTransport:
+    """Sends calls in-process through the ASGI handler (Django's async test client)."""
+
+    def __init__(self):
+        allow_test_clients()
+        self.client = AsyncClient()
+
+    async def __call__(self, call):
+        if call['method'] == 'GET':
+            response = await self.client.get(call['path'])
+        else:
+            response = await self.client.generic(call['method'], call['path'], json.dumps(call['body']),
+                                                 content_type='application/json')
+        if response.streaming:
+            async for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+
+class HTTPTransport:
+    """Sends calls to a running server, e.g. ``http://127.0.0.1:8000``."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def __call__(self, call):
+        data = json.dumps(call['body']).encode() if call['body'] is not None else None
+        request = urllib.request.Request(self.base_url + call['path'], data=data, method=call['method'],
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def replay(workload, send, concurrency=1):
+    """
+    Replay ``workload`` with ``concurrency`` threads calling ``send(call)``.
+
+    Returns a report: per-endpoint latency summary, throughput (requests/s
+    over the whole run) and error count (exceptions and 5xx responses), plus
+    an ``overall`` entry.
+    """
+    calls = queue.Queue()
+    for call in workload:
+        calls.put(call)
+    samples = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                call = calls.get_nowait()
+            except queue.Empty:
+                return
+            started = time.perf_counter()
+            try:
+                failed = send(call) >= 500
+            except Exception:
+                failed = True
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples.setdefault(call['endpoint'], []).append(elapsed)
+                errors[call['endpoint']] = errors.get(call['endpoint'], 0) + failed
+
+    def thread_worker():
+        try:
+            worker()
+        finally:
+            # Each thread opened its own connections; close them before it exits
+            connections.close_all()
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        # Run in the calling thread so the calls share its connection (and transaction)
+        worker()
+    else:
+        threads = [threading.Thread(target=thread_worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return build_report(samples, errors, time.perf_counter() - started)
+
+
+async def areplay(workload, send, concurrency=1):
+    """
+    :func:`replay` for an async ``send(call)``: ``concurrency`` tasks on the
+    running event loop instead of threads. Same report.
+    """
+    calls = iter(workload)
+    samples = {}
+    errors = {}
+
+    async def worker():
+        for call in calls:
+            started = time.perf_counter()
+            try:
+                failed = await send(call) >= 500
+            except Exception:
+                failed = True
+            samples.setdefault(call['endpoint'], []).append((time.perf_counter() - started) * 1000)
+            errors[call['endpoint']] = errors.get(call['endpoint'], 0) + failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+    return build_report(samples, errors, time.perf_counter() - started)
+
+
+def build_report(samples, errors, wall):
+    report = {}
+    for endpoint, latencies in sorted(samples.items()):
+        report[endpoint] = dict(summarize(latencies), errors=errors[endpoint],
+                                throughput_rps=round(len(latencies) / wall, 2) if wall else 0.0)
+    everything = [latency for latencies in samples.values() for latency in latencies]
+    report['overall'] = dict(summarize(everything), errors=sum(errors.values()),
+                             throughput_rps=round(len(everything) / wall, 2) if wall else 0.0)
+    return report
+
+
+def find_regressions(report, baseline, tolerance=0.2):
+    """
+    Metrics of ``report`` that are more than ``tolerance`` (a fraction) worse
+    than ``baseline``: higher latency, lower throughput or any new errors.
+    Returns a list of ``(endpoint, metric, baseline value, current value)``.
+    """
+    regressions = []
+    for endpoint, stats in report.items():
+        before = baseline.get(endpoint)
+        if before is None:
+            continue
+        for metric in REGRESSION_METRICS:
+            if before[metric] and stats[metric] > before[metric] * (1 + tolerance):
+                regressions.append((endpoint, metric, before[metric], stats[metric]))
+        if before['throughput_rps'] and stats['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append((endpoint, 'throughput_rps', before['throughput_rps'], stats['throughput_rps']))
+        if stats['errors'] > before['errors']:
+            regressions.append((endpoint, 'errors', before['errors'], stats['errors']))
+    return regressions
+
+
+def stress_create_loan(customer_ids, threads=8, requests_per_thread=20, loan_amount=50000, retries=1):
+    """
+    Hammer ``/create-loan`` for ``customer_ids`` from ``threads`` threads.
+
+    Every application carries an ``Idempotency-Key`` and is sent ``1 + retries``
+    times, like a client retrying after a timeout. Afterwards each customer's
+    loans are replayed in insertion order to count approvals granted while
+    the customer's current loans were already over ``approved_limit``, and
+    loans beyond one per approved key. Both must be 0.
+    """
+    allow_test_clients()
+    today = date.today()
+    first_new_id = (Loan.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+    applications = queue.Queue()
+    for n in range(threads * requests_per_thread):
+        applications.put((f'stress-{first_new_id}-{n}', customer_ids[n % len(customer_ids)]))
+    approved_keys = set()
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        client = Client()
+        try:
+            while True:
+                try:
+                    key, customer_id = applications.get_nowait()
+                except queue.Empty:
+                    return
+                body = {'customer_id': customer_id, 'loan_amount': loan_amount, 'interest_rate': 12, 'tenure': 12}
+                for _ in range(1 + retries):
+                    response = client.post('/create-loan/', body, content_type='application/json',
+                                           headers={'idempotency-key': key})
+                    with lock:
+                        if response.status_code != 200:
+                            errors.append(response.status_code)
+                        elif response.json()['loan_approved']:
+                            approved_keys.add(key)
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    over_limit = 0
+    created = 0
+    for customer in Customer.objects.filter(customer_id__in=set(customer_ids)):
+        # Same rule as check_loan_eligibility: approve only while current loans <= limit
+        current = Loan.objects.filter(customer_id=customer, id__lt=first_new_id).exclude(end_date__lt=today)
+        running = current.aggregate(total=Sum('loan_amount'))['total'] or 0
+        for amount in Loan.objects.filter(customer_id=customer, id__gte=first_new_id).order_by('id').values_list('loan_amount', flat=True):
+            over_limit += running > customer.approved_limit
+            running += amount
+            created += 1
+
+    calls = threads * requests_per_thread * (1 + retries)
+    return {
+        'calls': calls,
+        'applications': threads * requests_per_thread,
+        'approved': len(approved_keys),
+        'loans_created': created,
+        'duplicate_loans': created - len(approved_keys),
+        'over_limit_approvals': over_limit,
+        'errors': len(errors),
+        'seconds': round(wall, 3),
+        'throughput_rps': round(calls / wall, 2) if wall else 0.0,
+    }
+
+
+def serializer_loan_detail(loan):
+    # view-loan's body as it was built before the rendering mappers
+    customer = loan.customer_id
+    return LoanDetailsSerializer({
+        'loan_id': loan.loan_id,
+        'customer': {
+            'customer_id': customer.customer_id,
+            'first_name': customer.first_name,
+            'last_name': customer.last_name,
+            'phone_number': customer.phone_number,
+            'age': customer.age,
+        },
+        'loan_amount': loan.loan_amount,
+        'interest_rate': loan.interest_rate,
+        'monthly_installment': loan.monthly_repayment,
+        'tenure': loan.tenure,
+    }).data
+
+
+def compare_rendering(loans=1000, repeat=5):
+    """
+    Render the same loans to JSON bytes through the DRF serializers and
+    through the :mod:`.rendering` mappers. Rows are fetched once up front, so
+    only rendering is timed; each path keeps its best of ``repeat`` runs.
+
+    Returns ``{shape: {path: {'seconds', 'rows_per_second'}, 'speedup',
+    'identical'}}`` for the view-loan (detail) and view-loans (list) bodies.
+    """
+    renderer = JSONRenderer()
+    instances = list(Loan.objects.select_related('customer_id').order_by('id')[:loans])
+    detail_rows = list(Loan.objects.order_by('id').values_list(*LOAN_DETAIL_COLUMNS)[:loans])
+    # view-loans rows (the .values() shape of active_loans_queryset) for the same loans
+    list_rows = [
+        {'id': loan.id, 'loan_id': loan.loan_id, 'loan_amount': loan.loan_amount, 'interest_rate': loan.interest_rate,
+         'tenure': loan.tenure, 'monthly_installment': loan.monthly_repayment, 'repayments_left': loan.tenure}
+        for loan in instances
+    ]
+    shapes = {
+        'detail': {
+            'serializer': lambda: [renderer.render(serializer_loan_detail(loan)) for loan in instances],
+            'mapper': lambda: [renderer.render(loan_detail(row)) for row in detail_rows],
+        },
+        'list': {
+            'serializer': lambda: renderer.render(LoanDetailsCustomerSerializer(list_rows, many=True).data),
+            'mapper': lambda: renderer.render(active_loan.many(list_rows)),
+        },
+    }
+
+    results = {}
+    for shape, paths in shapes.items():
+        result = {}
+        outputs = {}
+        for path, render in paths.items():
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                outputs[path] = render()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            result[path] = {
+                'seconds': round(best, 6),
+                'rows_per_second': round(len(instances) / best, 1) if best else 0.0,
+            }
+        result['speedup'] = round(result['serializer']['seconds'] / result['mapper']['seconds'], 2) if result['mapper']['seconds'] else 0.0
+        result['identical'] = outputs['serializer'] == outputs['mapper']
+        results[shape] = result
+    return results
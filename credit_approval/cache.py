@@ -0,0 +1,308 @@
+# credit_approval/cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU with an optional per-entry time to live."""
+
+    def __init__(self, maxsize=1024, timeout=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    """
+    In-process :class:`LRUCache` in front of a Django cache backend.
+
+    Local entries live for ``local_timeout`` seconds at most; that bounds how
+    long another process can serve a value this process has invalidated.
+    Keys are tuples and are flattened to ``prefix:part:part`` for the shared tier.
+    """
+
+    def __init__(self, prefix, maxsize=1024, local_timeout=5, timeout=300, alias='default'):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.alias = alias
+        self.local = LRUCache(maxsize=maxsize, timeout=local_timeout)
+        self._counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def shared_key(self, key):
+        return ':'.join(str(part) for part in (self.prefix,) + tuple(key))
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self._counters[counter] += n
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.count('local_hits')
+            return value
+
+        value = self.shared.get(self.shared_key(key), MISSING)
+        if value is not MISSING:
+            self.local.set(key, value)
+            self.count('shared_hits')
+            return value
+
+        self.count('misses')
+        return MISSING
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        self.shared.set(self.shared_key(key), value, self.timeout)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        for key in keys:
+            self.local.delete(key)
+        self.shared.delete_many([self.shared_key(key) for key in keys])
+        self.count('invalidations', len(keys))
+
+    def clear(self):
+        self.local.clear()
+        with self._lock:
+            for counter in self._counters:
+                self._counters[counter] = 0
+            self.local.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats.update({
+            'evictions': self.local.evictions,
+            'local_size': len(self.local),
+            'local_maxsize': self.local.maxsize,
+            'hit_ratio': round((stats['local_hits'] + stats['shared_hits']) / lookups, 4) if lookups else 0.0,
+        })
+        return stats
+
+
+_score_settings = getattr(settings, 'CREDIT_SCORE_CACHE', {})
+
+# Keyed by (customer_id, date); invalidated by Loan/Customer writes
+credit_score_cache = TwoTierCache(
+    'credit_score',
+    maxsize=_score_settings.get('MAXSIZE', 10000),
+    local_timeout=_score_settings.get('LOCAL_TIMEOUT', 5),
+    timeout=_score_settings.get('TIMEOUT', 24 * 60 * 60),
+    alias=_score_settings.get('CACHE_ALIAS', 'default'),
+)
+
+
+class ResponseCache(TwoTierCache):
+    """
+    :class:`TwoTierCache` of rendered GET responses. Each key (a loan, a
+    customer) holds the responses of up to ``max_variants`` URLs, so one
+    delete invalidates every page and query string of that resource.
+    Also counts the requests answered with 304 Not Modified.
+    """
+
+    def __init__(self, prefix, max_variants=16, **kwargs):
+        super().__init__(prefix, **kwargs)
+        self.max_variants = max_variants
+        self._counters['not_modified'] = 0
+
+    def get(self, key, variant):
+        variants, tier = self.local.get(key), 'local_hits'
+        if variants is MISSING:
+            variants, tier = self.shared.get(self.shared_key(key), MISSING), 'shared_hits'
+            if variants is not MISSING:
+                self.local.set(key, variants)
+        return self.lookup(variants, variant, tier)
+
+    async def aget(self, key, variant):
+        variants, tier = self.local.get(key), 'local_hits'
+        if variants is MISSING:
+            variants, tier = await self.shared.aget(self.shared_key(key), MISSING), 'shared_hits'
+            if variants is not MISSING:
+                self.local.set(key, variants)
+        return self.lookup(variants, variant, tier)
+
+    def lookup(self, variants, variant, tier):
+        entry = MISSING if variants is MISSING else variants.get(variant, MISSING)
+        self.count(tier if entry is not MISSING else 'misses')
+        return entry
+
+    def add_variant(self, key, variant, entry):
+        # Copied: the dict held by the local tier may be read by other threads
+        variants = self.local.get(key, {}).copy()
+        variants.pop(variant, None)
+        variants[variant] = entry
+        while len(variants) > self.max_variants:
+            del variants[next(iter(variants))]
+        return variants
+
+    def set(self, key, variant, entry):
+        super().set(key, self.add_variant(key, variant, entry))
+
+    async def aset(self, key, variant, entry):
+        variants = self.add_variant(key, variant, entry)
+        self.local.set(key, variants)
+        await self.shared.aset(self.shared_key(key), variants, self.timeout)
+
+
+_response_settings = getattr(settings, 'RESPONSE_CACHE', {})
+
+# Rendered view-loan / view-loans bodies, keyed by ('loan', loan_id) and
+# ('customer', customer_id); invalidated by Loan/Customer writes
+response_cache = ResponseCache(
+    'response',
+    max_variants=_response_settings.get('MAX_VARIANTS', 16),
+    maxsize=_response_settings.get('MAXSIZE', 10000),
+    local_timeout=_response_settings.get('LOCAL_TIMEOUT', 5),
+    timeout=_response_settings.get('TIMEOUT', 60 * 60),
+    alias=_response_settings.get('CACHE_ALIAS', 'default'),
+)
+
+
+def cacheable_request(request):
+    # Plain JSON reads only: the browsable API (text/html) and ?stream=1 render every time
+    return (request.method == 'GET' and 'stream' not in request.GET
+            and 'text/html' not in request.headers.get('Accept', ''))
+
+
+def response_entry(response):
+    """Cache entry for a rendered 200 response, or ``None`` if it cannot be stored."""
+    if response.status_code != 200 or response.streaming:
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    body, link = response.content, response.get('Link')
+    # The Link header is part of the representation: a page that gains a next page changes
+    digest = hashlib.blake2b(body, digest_size=16)
+    digest.update((link or '').encode())
+    return {
+        'body': body,
+        'content_type': response['Content-Type'],
+        'etag': '"%s"' % digest.hexdigest(),
+        'last_modified': int(time.time()),
+        'link': link,
+    }
+
+
+def with_validators(response, entry):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    if entry['link']:
+        response['Link'] = entry['link']
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def conditional_response(request, response, entry):
+    # 304 when If-None-Match / If-Modified-Since still match the entry
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'],
+                                        response=with_validators(response, entry))
+    if response.status_code == 304:
+        response_cache.count('not_modified')
+    return response
+
+
+def cached_response(prefix, kwarg):
+    """
+    Serve a GET view from :data:`response_cache`, keyed by ``(prefix,
+    kwargs[kwarg])`` and today's date plus the request URL. Hits, including 304s for a matching
+    ``If-None-Match``, are answered from the stored bytes without running the
+    view. Works on sync and async views; apply it below ``@query_budget``.
+    """
+    def decorator(view):
+        def cache_key(request, kwargs):
+            if not cacheable_request(request):
+                return None, None
+            # Bodies depend on the date (repayments_left, which loans are
+            # active), so yesterday's variants stop matching at midnight
+            return (prefix, kwargs[kwarg]), f'{date.today().isoformat()} {request.build_absolute_uri()}'
+
+        def from_entry(request, entry):
+            response = HttpResponse(entry['body'], content_type=entry['content_type'])
+            return conditional_response(request, response, entry)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                key, variant = cache_key(request, kwargs)
+                if key is None:
+                    return await view(request, *args, **kwargs)
+                entry = await response_cache.aget(key, variant)
+                if entry is not MISSING:
+                    return from_entry(request, entry)
+                response = await view(request, *args, **kwargs)
+                entry = response_entry(response)
+                if entry is None:
+                    return response
+                await response_cache.aset(key, variant, entry)
+                return conditional_response(request, response, entry)
+            return wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key, variant = cache_key(request, kwargs)
+            if key is None:
+                return view(request, *args, **kwargs)
+            entry = response_cache.get(key, variant)
+            if entry is not MISSING:
+                return from_entry(request, entry)
+            response = view(request, *args, **kwargs)
+            entry = response_entry(response)
+            if entry is None:
+                return response
+            response_cache.set(key, variant, entry)
+            return conditional_response(request, response, entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,265 @@
+# credit_approval/importers.py
+import datetime
+import hashlib
+import json
+import time
+from itertools import islice
+
+import pandas as pd
+from openpyxl import load_workbook
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .models import IDENTITY_FIELDS, Customer, Loan, identity_fingerprint, loan_status
+from .services import invalidate_credit_scores, invalidate_responses, rebuild_credit_summaries
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Excel header -> model field. Resolved once per file instead of once per row.
+CUSTOMER_COLUMNS = {
+    'Customer ID': 'customer_id',
+    'First Name': 'first_name',
+    'Last Name': 'last_name',
+    'Age': 'age',
+    'Phone Number': 'phone_number',
+    'Monthly Salary': 'monthly_salary',
+    'Approved Limit': 'approved_limit',
+}
+
+LOAN_COLUMNS = {
+    'Customer ID': 'customer_id_id',
+    'Loan ID': 'loan_id',
+    'Loan Amount': 'loan_amount',
+    'Tenure': 'tenure',
+    'Interest Rate': 'interest_rate',
+    'Monthly payment': 'monthly_repayment',
+    'EMIs paid on Time': 'emis_paid_on_time',
+    'Date of Approval': 'start_date',
+    'End Date': 'end_date',
+}
+
+DATE_FIELDS = ('start_date', 'end_date')
+
+
+def read_rows(path, columns, sheet_name='Sheet1'):
+    """
+    Read an Excel sheet into plain tuples ordered like ``columns.values()``.
+
+    Returns a ``(fields, rows)`` pair where ``rows`` is an iterator of tuples.
+    """
+    df = pd.read_excel(path, sheet_name=sheet_name, usecols=list(columns))
+    df = df.rename(columns=columns)[list(columns.values())]
+    for field in DATE_FIELDS:
+        if field in df:
+            df[field] = df[field].dt.date
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.columns), df.itertuples(index=False, name=None)
+
+
+def stream_rows(path, columns, sheet_name='Sheet1', min_row=None, max_row=None):
+    """
+    Lazily read an Excel sheet through a read-only workbook.
+
+    Same ``(fields, rows)`` contract as :func:`read_rows`, but rows are pulled
+    from disk as they are consumed so memory stays flat for any file size.
+    ``min_row``/``max_row`` are 1-based sheet rows (row 1 is the header) and
+    restrict the read to that range.
+    """
+    return list(columns.values()), _iter_sheet(path, list(columns), sheet_name, min_row, max_row)
+
+
+def count_rows(path, sheet_name='Sheet1'):
+    """Number of data rows (excluding the header) in an Excel sheet."""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        if sheet.max_row is None:
+            # Workbook has no stored dimensions; fall back to a full scan
+            sheet.reset_dimensions()
+            return max(sum(1 for _ in sheet.iter_rows(values_only=True)) - 1, 0)
+        return max(sheet.max_row - 1, 0)
+    finally:
+        workbook.close()
+
+
+def _iter_sheet(path, headers, sheet_name, min_row=None, max_row=None):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        first = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        header = [str(cell).strip() if cell is not None else None for cell in first]
+        missing = [column for column in headers if column not in header]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+        positions = [header.index(column) for column in headers]
+
+        for row in sheet.iter_rows(min_row=max(min_row or 2, 2), max_row=max_row, values_only=True):
+            if row is None or all(value is None for value in row):
+                continue
+            yield tuple(_cell_value(row[i]) if i < len(row) else None for i in positions)
+    finally:
+        workbook.close()
+
+
+def _cell_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+# Fields that identify a source row; incremental imports upsert on them
+NATURAL_KEYS = {
+    Customer: ['customer_id'],
+    Loan: ['customer_id_id', 'loan_id'],
+}
+
+
+def natural_key(obj):
+    # Customers are keyed by their sheet ID, loans by (customer, loan ID)
+    if isinstance(obj, Loan):
+        return (obj.customer_id_id, obj.loan_id)
+    return obj.customer_id
+
+
+def row_hash(model, fields, row):
+    """
+    Fingerprint of a source row. Values go through the model fields first,
+    so the pandas and openpyxl readers (numpy ints, floats, datetimes) hash
+    the same row to the same value.
+    """
+    values = [model._meta.get_field(field).to_python(value) for field, value in zip(fields, row)]
+    return hashlib.blake2b(json.dumps(values, default=str).encode(), digest_size=16).hexdigest()
+
+
+def stored_hashes(model, objs):
+    """``natural key -> source_hash`` of the rows of ``objs`` already stored."""
+    if model is Loan:
+        loan_ids = {obj.loan_id for obj in objs}
+        rows = Loan.objects.filter(loan_id__in=loan_ids).values_list('customer_id', 'loan_id', 'source_hash')
+        return {(customer_id, loan_id): source_hash for customer_id, loan_id, source_hash in rows}
+    customer_ids = [obj.customer_id for obj in objs]
+    return dict(Customer.objects.filter(customer_id__in=customer_ids).values_list('customer_id', 'source_hash'))
+
+
+def assign_fingerprints(customers):
+    """
+    Set the identity fingerprint of imported customers, except where another
+    customer (stored, or earlier in the list) already holds it. The sheets
+    are keyed by Customer ID, so such duplicates are still imported, only
+    without a fingerprint.
+    """
+    for customer in customers:
+        customer.identity_fingerprint = identity_fingerprint(*(getattr(customer, field) for field in IDENTITY_FIELDS))
+    owners = dict(Customer.objects.filter(identity_fingerprint__in=[customer.identity_fingerprint for customer in customers])
+                  .values_list('identity_fingerprint', 'customer_id'))
+    for customer in customers:
+        if owners.setdefault(customer.identity_fingerprint, customer.customer_id) != customer.customer_id:
+            customer.identity_fingerprint = None
+
+
+def bulk_import(model, fields, rows, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False, progress=None):
+    """
+    Insert ``rows`` into ``model`` with one ``bulk_create`` per chunk.
+
+    Each chunk runs in its own transaction, so the import can be re-run
+    safely. By default rows whose natural key is already stored are skipped.
+    With ``incremental`` they are compared by :func:`row_hash` instead: rows
+    that changed since the last import are upserted, unchanged ones are left
+    alone. ``progress`` is called as ``progress(stats)`` after every chunk.
+    """
+    stats = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+    keys = NATURAL_KEYS[model]
+    update_fields = [field for field in fields if field not in keys] + ['source_hash']
+    if model is Customer:
+        update_fields.append('identity_fingerprint')
+    else:
+        update_fields.append('status')
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        objs = [model(source_hash=row_hash(model, fields, row), **dict(zip(fields, row))) for row in chunk]
+        stored = stored_hashes(model, objs)
+        new_objs = []
+        changed_objs = []
+        seen = set()
+        for obj in objs:
+            key = natural_key(obj)
+            if key in seen:
+                continue
+            seen.add(key)
+            if key not in stored:
+                new_objs.append(obj)
+            elif incremental and stored[key] != obj.source_hash:
+                changed_objs.append(obj)
+
+        if model is Customer and (new_objs or changed_objs):
+            assign_fingerprints(new_objs + changed_objs)
+        elif model is Loan:
+            # bulk_create skips Loan.save(); loans that already ended arrive closed
+            today = datetime.date.today()
+            for obj in new_objs + changed_objs:
+                obj.status = loan_status(obj.end_date, today)
+
+        with transaction.atomic():
+            model.objects.bulk_create(new_objs, batch_size=chunk_size)
+            if changed_objs:
+                model.objects.bulk_create(changed_objs, batch_size=chunk_size, update_conflicts=True,
+                                          unique_fields=keys, update_fields=update_fields)
+            # bulk_create skips the model signals, so refresh the summaries here;
+            # a changed customer can have a new approved_limit
+            if model is Loan:
+                customer_ids = {obj.customer_id_id for obj in new_objs + changed_objs}
+            else:
+                customer_ids = {obj.customer_id for obj in changed_objs}
+            if customer_ids:
+                rebuild_credit_summaries(customer_ids, chunk_size=chunk_size)
+                invalidate_credit_scores(customer_ids)
+                loan_ids = [obj.loan_id for obj in new_objs + changed_objs] if model is Loan else None
+                invalidate_responses(customer_ids, loan_ids)
+
+        stats['rows'] += len(chunk)
+        stats['created'] += len(new_objs)
+        if incremental:
+            stats['updated'] += len(changed_objs)
+            stats['unchanged'] += len(chunk) - len(new_objs) - len(changed_objs)
+        else:
+            stats['skipped'] += len(chunk) - len(new_objs)
+        stats['seconds'] = time.perf_counter() - started
+        if progress is not None:
+            progress(stats)
+
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def rows_per_second(stats):
+    return stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+
+
+def reset_sequences(models=(Customer, Loan)):
+    # Explicit primary keys bypass the sequences on PostgreSQL; bring them back in line
+    statements = connection.ops.sequence_reset_sql(no_style(), list(models))
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def analyze_tables(models=(Customer, Loan)):
+    """
+    Refresh the query planner's statistics after a bulk load. Without them
+    SQLite serves view-loans pages from the end_date index plus a full sort
+    instead of walking loan_customer_keyset_idx.
+    """
+    tables = [connection.ops.quote_name(model._meta.db_table) for model in models]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'ANALYZE TABLE {", ".join(tables)}')
+        else:
+            for table in tables:
+                cursor.execute(f'ANALYZE {table}')
@@ -1,7 +1,24 @@
+import numpy as np
 
 
+# Scoring tables for calculate_factor_credit_score; a factor value that is not
+# listed scores the default
+FACTOR_WEIGHTS = {
+	"past_loans_paid_on_time": 0.4,
+	"num_past_loans": 0.25,
+	"current_year_loans": 0.2,
+	"loan_approved_volume": 0.1,
+}
+
+FACTOR_SCORES = {
+	"past_loans_paid_on_time": ({100: 5, 95: 4, 90: 3, 80: 2, 0: 1}, 0),
+	"num_past_loans": ({0: 5, 3: 4, 6: 3, 9: 2, 12: 1}, 1),
+	"current_year_loans": ({0: 5, 2: 4, 4: 3, 6: 1}, 1),
+	"loan_approved_volume": ({"High": 5, "Moderate": 3, "Low": 1}, 1),
+}
 
-def calculate_credit_score(data):
+
+def calculate_factor_credit_score(data):
 	"""
 	Calculates a credit score based on loan history and activity.
 
@@ -10,65 +27,14 @@ def calculate_credit_score(data):
 		- past_loans_paid_on_time: Percentage of past loans paid on time (0-100).
 		- num_past_loans: Number of loans taken in the past.
 		- current_year_loans: Number of loans taken in the current year.
-		- loan_approved_volume: Loan approved volume (e.g., total amount).
+		- loan_approved_volume: Loan approved volume ("High", "Moderate" or "Low").
 		- current_loans_sum: Sum of current loan balances.
 		- approved_limit: Approved credit limit.
 
 	Returns:
 	The calculated credit score (0-100).
 	"""
-
-	# Define weights for each factor
-	weights = {
-		"past_loans_paid_on_time": 0.4,
-		"num_past_loans": 0.25,
-		"current_year_loans": 0.2,
-		"loan_approved_volume": 0.1,
-	}
-
-	# Score each factor
-	scores = {
-		"past_loans_paid_on_time": {
-			100: 5,
-			95: 4,
-			90: 3,
-			80: 2,
-			0: 1,
-		}.get(data["past_loans_paid_on_time"], 0),
-		"num_past_loans": {
-			0: 5,
-			3: 4,
-			6: 3,
-			9: 2,
-			12: 1,
-		}.get(data["num_past_loans"], 1),
-		"current_year_loans": {
-			0: 5,
-			2: 4,
-			4: 3,
-			6: 1,
-		}.get(data["current_year_loans"], 1),
-		"loan_approved_volume": {
-			"High": 5,
-			"Moderate": 3,
-			"Low": 1,
-		}.get(data["loan_approved_volume"], 1),
-	}
-
-	# Check if current loans exceed approved limit
-	if data["current_loans_sum"] > data["approved_limit"]:
-		return 0
-
-	# Calculate weighted score
-	weighted_score = sum(weights[factor] * scores[factor] for factor in scores)
-
-	# Scale score to desired range (e.g., 0-100)
-	score_range = 100
-	score = int(weighted_score / sum(weights.values()) * score_range)
-
-	return score
-
-
+	return int(factor_credit_scores(**{key: [value] for key, value in data.items()})[0])
 
 
 # test that the function works
@@ -81,44 +47,189 @@ data = {
 	"approved_limit": 10000,
 }
 
-# print(calculate_credit_score(data))
+# print(calculate_factor_credit_score(data))
 
 
 
 def calculate_monthly_installment(loan_amount, interest_rate, tenure):
-	monthly_installment = round(loan_amount * (1 + interest_rate / 100) / tenure)
-	return monthly_installment
+	if tenure == 0:
+		raise ZeroDivisionError("division by zero")
+	return int(flat_installments([loan_amount], [interest_rate], [tenure])[0])
 
 
 def calculate_credit_score(past_loans_paid, num_loans, loan_activity_current_year, approved_volume, current_loans_sum, approved_limit):
-    max_possible_num_loans=12
+    return float(credit_scores([past_loans_paid], [num_loans], [loan_activity_current_year], [approved_volume],
+                               [current_loans_sum], [approved_limit])[0])
+
+# print(calculate_credit_score(100, 10, 1, 100000, 999, 10000))
+
+
+# Vectorized engine
+#
+# Every function below takes array-likes (one element per application/loan)
+# and returns NumPy arrays. The arithmetic is done in the same order as the
+# scalar code it replaces so that results match it bit for bit; the scalar
+# functions above and in views.py are thin wrappers around these.
+
+def factor_credit_scores(past_loans_paid_on_time, num_past_loans, current_year_loans, loan_approved_volume,
+                         current_loans_sum, approved_limit):
+    factors = {
+        "past_loans_paid_on_time": np.asarray(past_loans_paid_on_time),
+        "num_past_loans": np.asarray(num_past_loans),
+        "current_year_loans": np.asarray(current_year_loans),
+        "loan_approved_volume": np.asarray(loan_approved_volume),
+    }
+
+    weighted_score = 0
+    for factor, values in factors.items():
+        table, default = FACTOR_SCORES[factor]
+        scores = np.select([values == key for key in table], list(table.values()), default=default)
+        weighted_score = weighted_score + FACTOR_WEIGHTS[factor] * scores
+
+    # Scale score to desired range (e.g., 0-100)
+    score = np.trunc(weighted_score / sum(FACTOR_WEIGHTS.values()) * 100).astype(np.int64)
+
+    # Check if current loans exceed approved limit
+    over_limit = np.asarray(current_loans_sum) > np.asarray(approved_limit)
+    return np.where(over_limit, 0, score)
+
+
+def credit_scores(past_loans_paid, num_loans, loan_activity_current_year, approved_volume, current_loans_sum,
+                  approved_limit):
+    max_possible_num_loans = 12
     max_possible_activity = 12
     max_possible_approved_volume = 1000000
-    # Normalize values
-    normalized_past_loans_paid = past_loans_paid / 100
-    normalized_num_loans = num_loans / max_possible_num_loans
-    normalized_loan_activity = loan_activity_current_year / max_possible_activity
-    normalized_approved_volume = approved_volume / max_possible_approved_volume
-
-    # Assign weights
-    weight_past_loans_paid = 0.4
-    weight_num_loans = 0.1
-    weight_loan_activity = 0.2
-    weight_approved_volume = 0.3
-
-    # Calculate component scores
-    score_past_loans_paid = normalized_past_loans_paid * weight_past_loans_paid
-    score_num_loans = (1 - normalized_num_loans) * weight_num_loans
-    score_loan_activity = normalized_loan_activity * weight_loan_activity
-    score_approved_volume = normalized_approved_volume * weight_approved_volume
-
-    # Check if sum of current loans > approved limit
-    if current_loans_sum > approved_limit:
-        final_credit_score = 0
-    else:
-        # Combine component scores
-        final_credit_score = score_past_loans_paid + score_num_loans + score_loan_activity + score_approved_volume
-
-    return final_credit_score *100
 
-# print(calculate_credit_score(100, 10, 1, 100000, 999, 10000))
+    # Normalize values
+    normalized_past_loans_paid = np.asarray(past_loans_paid, dtype=np.float64) / 100
+    normalized_num_loans = np.asarray(num_loans, dtype=np.float64) / max_possible_num_loans
+    normalized_loan_activity = np.asarray(loan_activity_current_year, dtype=np.float64) / max_possible_activity
+    normalized_approved_volume = np.asarray(approved_volume, dtype=np.float64) / max_possible_approved_volume
+
+    # Component scores, weighted 0.4 / 0.1 / 0.2 / 0.3
+    final_credit_score = (
+        normalized_past_loans_paid * 0.4
+        + (1 - normalized_num_loans) * 0.1
+        + normalized_loan_activity * 0.2
+        + normalized_approved_volume * 0.3
+    )
+
+    # Zero if sum of current loans > approved limit
+    over_limit = np.asarray(current_loans_sum) > np.asarray(approved_limit)
+    return np.where(over_limit, 0.0, final_credit_score) * 100
+
+
+def average_loan_credit_scores(active_loan_sums, active_loan_counts):
+    """Score used by the API: average active loan amount per 1000, capped at 100."""
+    sums = np.asarray(active_loan_sums, dtype=np.float64)
+    counts = np.asarray(active_loan_counts, dtype=np.int64)
+    has_loans = counts > 0
+    average_loan_amount = sums / np.where(has_loans, counts, 1)
+    scores = np.minimum(np.trunc((average_loan_amount / 1000) * 10), 100).astype(np.int64)
+    return np.where(has_loans, scores, 0)
+
+
+def interest_rate_slabs(credit_scores, interest_rates, current_loan_sums, approved_limits):
+    """
+    Approval and corrected interest rate per application.
+
+    Scores above 50 keep their rate, 30-50 pay at least 12%, 10-30 at least
+    16%; anything else, or current loans above the approved limit, is
+    rejected with a rate of 0. Boundary scores (50, 30, 10) fall through to
+    the next slab exactly like the scalar checks.
+    """
+    scores = np.asarray(credit_scores)
+    rates = np.asarray(interest_rates, dtype=np.float64)
+    over_limit = np.asarray(current_loan_sums) > np.asarray(approved_limits)
+
+    conditions = [
+        over_limit,
+        scores > 50,
+        (50 > scores) & (scores > 30),
+        (30 > scores) & (scores > 10),
+    ]
+    corrected = np.select(conditions, [0.0, rates, np.maximum(rates, 12.0), np.maximum(rates, 16.0)], default=0.0)
+    approved = np.select(conditions, [False, True, True, True], default=False).astype(bool)
+    return approved, corrected
+
+
+def amortized_installments(loan_amounts, interest_rates, tenures):
+    """
+    Reducing-balance EMI per loan; 0.0 where the formula is undefined
+    (zero tenure, zero rate or an out-of-range power), as in the scalar code.
+    """
+    loan_amounts = np.asarray(loan_amounts, dtype=np.float64)
+    tenures = np.asarray(tenures, dtype=np.float64)
+    monthly_interest_rate = np.asarray(interest_rates, dtype=np.float64) / 12 / 100
+
+    growth = discount_factors(monthly_interest_rate, tenures)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        denominator = 1 - growth
+        installments = (loan_amounts * monthly_interest_rate) / denominator
+
+    undefined = (tenures == 0) | (denominator == 0) | ~np.isfinite(growth)
+    return np.where(undefined, 0.0, installments)
+
+
+def discount_factors(monthly_interest_rates, tenures):
+    """
+    ``(1 + r) ** -n`` per element, evaluated with the C library ``pow`` like
+    the scalar formula (NumPy's own ``pow`` can differ in the last bit).
+    Distinct (rate, tenure) pairs are few in a portfolio, so each is computed
+    once and broadcast back; overflow yields ``inf`` instead of raising.
+    """
+    rates = np.asarray(monthly_interest_rates, dtype=np.float64)
+    tenures = np.asarray(tenures, dtype=np.float64)
+    if rates.size == 0:
+        return np.empty(np.broadcast(rates, tenures).shape)
+    rates, tenures = np.broadcast_arrays(rates, tenures)
+    unique_rates, rate_codes = np.unique(rates.ravel(), return_inverse=True)
+    unique_tenures, tenure_codes = np.unique(tenures.ravel(), return_inverse=True)
+    pair_codes, inverse = np.unique(rate_codes * len(unique_tenures) + tenure_codes, return_inverse=True)
+
+    values = np.empty(len(pair_codes))
+    for i, code in enumerate(pair_codes.tolist()):
+        rate = float(unique_rates[code // len(unique_tenures)])
+        tenure = float(unique_tenures[code % len(unique_tenures)])
+        try:
+            values[i] = (1 + rate) ** -tenure
+        except (OverflowError, ZeroDivisionError):
+            values[i] = np.inf
+    return values[inverse.ravel()].reshape(rates.shape)
+
+
+def flat_installments(loan_amounts, interest_rates, tenures):
+    """Flat-rate installment: principal plus one period of interest over the tenure (0 for zero tenure)."""
+    loan_amounts = np.asarray(loan_amounts, dtype=np.float64)
+    interest_rates = np.asarray(interest_rates, dtype=np.float64)
+    tenures = np.asarray(tenures, dtype=np.float64)
+    zero_tenure = tenures == 0
+    installments = np.round(loan_amounts * (1 + interest_rates / 100) / np.where(zero_tenure, 1, tenures))
+    return np.where(zero_tenure, 0, installments).astype(np.int64)
+
+
+def evaluate_applications(active_loan_sums, active_loan_counts, current_loan_sums, approved_limits,
+                          loan_amounts, interest_rates, tenures):
+    """
+    Score, price and decide a whole batch of applications in one call.
+
+    Returns a dict of arrays: ``credit_score``, ``approval``,
+    ``corrected_interest_rate`` and ``monthly_installment``.
+    """
+    scores = average_loan_credit_scores(active_loan_sums, active_loan_counts)
+    approval, corrected = interest_rate_slabs(scores, interest_rates, current_loan_sums, approved_limits)
+    return {
+        'credit_score': scores,
+        'approval': approval,
+        'corrected_interest_rate': corrected,
+        'monthly_installment': amortized_installments(loan_amounts, corrected, tenures),
+    }
+
+
+def approved_limits(monthly_salaries):
+    """
+    Registration limit per customer: 36 months of salary, rounded to the
+    nearest lakh (ties to even, like the scalar ``round``).
+    """
+    salaries = np.asarray(monthly_salaries, dtype=np.float64)
+    return (np.round(36 * salaries / 100000) * 100000).astype(np.int64)
@@ -0,0 +1,82 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_approval.benchmarks import (
+    HTTPTransport,
+    TestClientTransport,
+    build_workload,
+    find_regressions,
+    load_workload,
+    replay,
+    save_workload,
+    seed_dataset,
+)
+from credit_approval.models import Customer
+
+
+def parse_mix(value):
+    # "register=1,check_eligibility=4" -> {'register': 1, 'check_eligibility': 4}
+    try:
+        return {name: int(weight) for name, weight in (part.split('=') for part in value.split(','))}
+    except ValueError:
+        raise CommandError(f'Invalid --mix {value!r}; expected endpoint=weight,...')
+
+
+class Command(BaseCommand):
+    help = ('Replay a mixed register/check-eligibility/create-loan/view-loans workload and report '
+            'per-endpoint latency percentiles and throughput. Writes go to the configured database: '
+            'run it against a benchmark database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-customers', type=int, default=0, help='Synthetic customers to insert first')
+        parser.add_argument('--seed-loans', type=int, default=0, help='Synthetic loans to insert first')
+        parser.add_argument('--requests', type=int, default=1000, help='Calls in a generated workload')
+        parser.add_argument('--mix', type=parse_mix, default=None, help='Endpoint weights, e.g. check_eligibility=4,view_loans=3')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the generated workload')
+        parser.add_argument('--workload', help='Replay the calls in this JSON Lines file instead of generating them')
+        parser.add_argument('--save-workload', help='Write the generated workload to this JSON Lines file')
+        parser.add_argument('--concurrency', type=int, default=1, help='Concurrent client threads')
+        parser.add_argument('--target', help='Base URL of a running server (default: in-process test client)')
+        parser.add_argument('--save-baseline', help='Write the report to this file')
+        parser.add_argument('--baseline', help='Compare against the report in this file')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before flagging (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        if options['seed_customers'] or options['seed_loans']:
+            seed_dataset(customers=options['seed_customers'], loans=options['seed_loans'])
+
+        if options['workload']:
+            workload = load_workload(options['workload'])
+        else:
+            customer_ids = list(Customer.objects.values_list('customer_id', flat=True))
+            if not customer_ids:
+                raise CommandError('No customers to benchmark; import data or pass --seed-customers')
+            workload = build_workload(customer_ids, options['requests'], options['mix'], options['seed'])
+        if options['save_workload']:
+            save_workload(options['save_workload'], workload)
+
+        send = HTTPTransport(options['target']) if options['target'] else TestClientTransport()
+        report = replay(workload, send, options['concurrency'])
+
+        self.stdout.write(f'{len(workload)} calls, concurrency {options["concurrency"]}')
+        self.stdout.write('endpoint              count    p50 ms    p95 ms    p99 ms     req/s  errors')
+        for endpoint, stats in report.items():
+            self.stdout.write(
+                f'{endpoint:<20} {stats["count"]:>6} {stats["p50_ms"]:>9.2f} {stats["p95_ms"]:>9.2f} '
+                f'{stats["p99_ms"]:>9.2f} {stats["throughput_rps"]:>9.1f} {stats["errors"]:>7}'
+            )
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = find_regressions(report, baseline, options['tolerance'])
+            for endpoint, metric, before, after in regressions:
+                self.stdout.write(self.style.ERROR(f'REGRESSION {endpoint} {metric}: {before} -> {after}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_approval.benchmarks import (
+    READ_MIX,
+    AsyncClientTransport,
+    HTTPTransport,
+    TestClientTransport,
+    areplay,
+    build_workload,
+    replay,
+    seed_dataset,
+)
+from credit_approval.models import Customer, Loan
+
+
+class ThreadSampler:
+    """Peak number of live threads while the block runs."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        # The sampler itself is not serving requests
+        self.peak -= 1
+
+
+class Command(BaseCommand):
+    help = ('Compare the read endpoints (view-loan, view-loans, check-eligibility) under WSGI and '
+            'ASGI at increasing concurrency. In-process by default: WSGI uses one thread per '
+            'in-flight request, ASGI one event loop with the async views.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-customers', type=int, default=0, help='Synthetic customers to insert first')
+        parser.add_argument('--seed-loans', type=int, default=0, help='Synthetic loans to insert first')
+        parser.add_argument('--requests', type=int, default=2000, help='Calls per run')
+        parser.add_argument('--concurrency', default='1,8,32,128',
+                            help='Comma-separated in-flight request counts to try')
+        parser.add_argument('--wsgi-url', help='Benchmark a running WSGI server instead of the in-process handler')
+        parser.add_argument('--asgi-url', help='Benchmark a running ASGI server instead of the in-process handler')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+
+    def handle(self, *args, **options):
+        if options['seed_customers'] or options['seed_loans']:
+            seed_dataset(customers=options['seed_customers'], loans=options['seed_loans'])
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True))
+        loan_ids = list(Loan.objects.values_list('loan_id', flat=True)[:100000])
+        if not loan_ids:
+            raise CommandError('No loans to benchmark; import data or pass --seed-loans')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of integers')
+
+        workload = build_workload(customer_ids, options['requests'], READ_MIX, loan_ids=loan_ids)
+        # One untimed pass so both servers start with today's credit summaries in place
+        replay(workload, TestClientTransport())
+
+        results = {}
+        self.stdout.write('server  in-flight     req/s    p50 ms    p95 ms    p99 ms  threads  errors')
+        for level in levels:
+            for server in ('wsgi', 'asgi'):
+                with ThreadSampler() as threads:
+                    report = self.run(server, workload, level, options)
+                overall = dict(report['overall'], peak_threads=threads.peak)
+                results.setdefault(server, {})[level] = dict(report, overall=overall)
+                self.stdout.write(
+                    f'{server:<7} {level:>9} {overall["throughput_rps"]:>9.1f} {overall["p50_ms"]:>9.2f} '
+                    f'{overall["p95_ms"]:>9.2f} {overall["p99_ms"]:>9.2f} {overall["peak_threads"]:>8} '
+                    f'{overall["errors"]:>7}'
+                )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run(self, server, workload, concurrency, options):
+        url = options[f'{server}_url']
+        if url:
+            # A remote server is driven the same way for both; only the server differs
+            return replay(workload, HTTPTransport(url), concurrency)
+        if server == 'wsgi':
+            return replay(workload, TestClientTransport(), concurrency)
+        return asyncio.run(areplay(workload, AsyncClientTransport(), concurrency))
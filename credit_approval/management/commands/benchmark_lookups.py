@@ -0,0 +1,115 @@
+import json
+import random
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+
+from credit_approval.benchmarks import measure, seed_dataset, summarize
+from credit_approval.models import Customer, Loan
+
+
+def lookups(today):
+    # (name, queryset for a sample, how the view evaluates it)
+    return [
+        ('view_loan_by_loan_id',
+         lambda s: Loan.objects.filter(loan_id=s['loan_id']),
+         list),
+        ('check_loan_eligibility',
+         lambda s: Loan.objects.filter(customer_id=s['customer_id'], status=Loan.STATUS_ACTIVE).exclude(end_date__lt=today),
+         lambda qs: qs.aggregate(Sum('loan_amount'))),
+        ('calculate_credit_score',
+         lambda s: Loan.objects.filter(customer_id=s['customer_id'], status=Loan.STATUS_ACTIVE, end_date__gte=today),
+         lambda qs: qs.aggregate(Sum('loan_amount'), Count('id'))),
+        ('registration_dedupe',
+         lambda s: Customer.objects.filter(**s['identity']),
+         lambda qs: qs.exists()),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Show query plans and latency of the hot Loan/Customer lookups with and without '
+            'the lookup indexes. The "without" pass drops the indexes inside a transaction that is '
+            'rolled back, which locks the tables on PostgreSQL: run it against a benchmark database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-customers', type=int, default=0, help='Synthetic customers to insert first')
+        parser.add_argument('--seed-loans', type=int, default=0, help='Synthetic loans to insert first (e.g. 1000000)')
+        parser.add_argument('--repeat', type=int, default=200, help='Samples per lookup')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+
+    def handle(self, *args, **options):
+        if options['seed_loans'] and not (options['seed_customers'] or Customer.objects.exists()):
+            raise CommandError('--seed-loans needs customers; pass --seed-customers')
+        if options['seed_customers'] or options['seed_loans']:
+            seed_dataset(
+                customers=options['seed_customers'],
+                loans=options['seed_loans'],
+                progress=lambda done: self.stdout.write(f'seeded {done} loans'),
+            )
+
+        samples = self.sample_keys(options['repeat'])
+        if not samples:
+            raise CommandError('No loans to benchmark; import data or pass --seed-loans')
+
+        self.stdout.write(f'{Loan.objects.count()} loans, {Customer.objects.count()} customers, {len(samples)} samples')
+        results = {}
+        self.stdout.write('\n##### without lookup indexes')
+        with transaction.atomic():
+            self.drop_lookup_indexes()
+            results['without_indexes'] = self.run_pass(samples)
+            transaction.set_rollback(True)
+        # Start the indexed pass on a fresh connection so no statement prepared
+        # against the index-less schema is reused (SQLite caches EXPLAIN plans)
+        connection.close()
+        self.stdout.write('\n##### with lookup indexes')
+        results['with_indexes'] = self.run_pass(samples)
+
+        self.stdout.write('\nlookup                      without p50   with p50   speedup')
+        for name, stats in results['with_indexes'].items():
+            before = results['without_indexes'][name]['p50_ms']
+            after = stats['p50_ms']
+            speedup = before / after if after else 0.0
+            self.stdout.write(f'{name:<26} {before:>10.3f}ms {after:>8.3f}ms {speedup:>8.1f}x')
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def sample_keys(self, repeat):
+        bounds = Loan.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return []
+        rng = random.Random(0)
+        picked = {rng.randint(bounds['low'], bounds['high']) for _ in range(repeat)}
+        samples = []
+        for loan in Loan.objects.filter(id__in=picked).select_related('customer_id'):
+            customer = loan.customer_id
+            samples.append({
+                'loan_id': loan.loan_id,
+                'customer_id': customer.customer_id,
+                'identity': {
+                    'first_name': customer.first_name,
+                    'last_name': customer.last_name,
+                    'age': customer.age,
+                    'monthly_salary': customer.monthly_salary,
+                    'phone_number': customer.phone_number,
+                },
+            })
+        return samples
+
+    def run_pass(self, samples):
+        results = {}
+        for name, build, evaluate in lookups(date.today()):
+            self.stdout.write(f'\n== {name}\n{build(samples[0]).explain()}')
+            latencies = measure(lambda s: evaluate(build(s)), [(s,) for s in samples])
+            results[name] = summarize(latencies)
+            self.stdout.write(json.dumps(results[name]))
+        return results
+
+    def drop_lookup_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Customer, Loan):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
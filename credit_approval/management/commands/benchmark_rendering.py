@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_approval.benchmarks import compare_rendering, seed_dataset
+from credit_approval.models import Customer, Loan
+
+
+class Command(BaseCommand):
+    help = ('Compare rendering the view-loan and view-loans bodies through the DRF serializers '
+            'and through the precompiled row mappers. Only rendering to JSON bytes is timed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-customers', type=int, default=0, help='Synthetic customers to insert first')
+        parser.add_argument('--seed-loans', type=int, default=0, help='Synthetic loans to insert first')
+        parser.add_argument('--loans', type=int, default=1000, help='Loans rendered per run')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the fastest is kept')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+
+    def handle(self, *args, **options):
+        if options['seed_loans'] and not (options['seed_customers'] or Customer.objects.exists()):
+            raise CommandError('--seed-loans needs customers; pass --seed-customers')
+        if options['seed_customers'] or options['seed_loans']:
+            seed_dataset(customers=options['seed_customers'], loans=options['seed_loans'])
+        if not Loan.objects.exists():
+            raise CommandError('No loans to render; import data or pass --seed-loans')
+
+        results = compare_rendering(loans=options['loans'], repeat=options['repeat'])
+        self.stdout.write('shape    serializer rows/s   mapper rows/s   speedup  identical')
+        for shape, result in results.items():
+            self.stdout.write(
+                f'{shape:<8} {result["serializer"]["rows_per_second"]:>17.1f} '
+                f'{result["mapper"]["rows_per_second"]:>15.1f} {result["speedup"]:>8.2f}x  {result["identical"]}'
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_approval.repayments import DEFAULT_BATCH_SIZE, ingest_events, read_events
+
+
+class Command(BaseCommand):
+    help = ("Apply EMI repayment events from a CSV or JSON Lines file. Events already recorded "
+            "(by event_id) are skipped, so a file can be re-run safely.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Events file: .csv with a header row, or JSON Lines')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Events per transaction')
+        parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                            help='Date balances are computed for (YYYY-MM-DD, default today)')
+        parser.add_argument('--show-rejected', type=int, default=10, help='Rejected events to print')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        try:
+            stats = ingest_events(
+                read_events(options['path']),
+                batch_size=options['batch_size'],
+                today=options['as_of'],
+                progress=lambda stats: self.stdout.write(
+                    f"{stats['received']} events read, {stats['applied']} applied"
+                ),
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for item in stats['rejected'][:options['show_rejected']]:
+            self.stdout.write(self.style.WARNING(f"event {item['index']}: {item['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['received']} events: {stats['applied']} applied, {stats['duplicates']} duplicates, "
+            f"{len(stats['rejected'])} rejected in {stats['seconds']:.2f}s ({stats['events_per_second']:.0f} events/s)"
+        ))
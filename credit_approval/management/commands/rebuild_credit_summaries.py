@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_approval.services import rebuild_credit_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute CustomerCreditSummary rows from the Loan table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('customer_ids', nargs='*', type=int, help='Only rebuild these customers (default: all)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Customers per upsert')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        started = time.perf_counter()
+        written = rebuild_credit_summaries(options['customer_ids'] or None, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{written} summaries rebuilt in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_approval.benchmarks import seed_dataset, stress_create_loan
+from credit_approval.models import Customer
+
+
+class Command(BaseCommand):
+    help = ('Submit concurrent create-loan applications (each retried with the same Idempotency-Key) '
+            'and check that no approval went over a customer\'s limit and no retry created a loan. '
+            'Writes go to the configured database: run it against a benchmark database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-customers', type=int, default=0, help='Synthetic customers to insert first')
+        parser.add_argument('--seed-loans', type=int, default=0, help='Synthetic loans to insert first')
+        parser.add_argument('--customers', type=int, default=10, help='How many customers the applications target')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=50, help='Applications per thread')
+        parser.add_argument('--loan-amount', type=int, default=50000)
+        parser.add_argument('--retries', type=int, default=1, help='Extra sends of each application')
+
+    def handle(self, *args, **options):
+        if options['seed_customers'] or options['seed_loans']:
+            seed_dataset(customers=options['seed_customers'], loans=options['seed_loans'])
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True)[:options['customers']])
+        if not customer_ids:
+            raise CommandError('No customers to apply for; import data or pass --seed-customers')
+
+        report = stress_create_loan(customer_ids, threads=options['threads'],
+                                    requests_per_thread=options['requests'],
+                                    loan_amount=options['loan_amount'], retries=options['retries'])
+        for name, value in report.items():
+            self.stdout.write(f'{name:<22} {value}')
+        if report['over_limit_approvals'] or report['duplicate_loans'] or report['errors']:
+            raise CommandError('create-loan let through over-limit approvals, duplicate loans or errors')
@@ -0,0 +1,161 @@
+# credit_approval/metrics.py
+import math
+import threading
+
+# Seconds; roughly the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with ``_sum`` and ``_count`` series."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series['count'] if series else 0
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, dict(value, buckets=list(value['buckets']))) for key, value in self._series.items())
+        for key, value in series:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets, value['buckets']):
+                cumulative += n
+                yield f'{self.name}_bucket', labels + (('le', format_value(bound)),), cumulative
+            yield f'{self.name}_sum', labels, value['sum']
+            yield f'{self.name}_count', labels, value['count']
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Values are per process, like the cache stats; Prometheus sums the workers
+registry = Registry()
+
+request_latency = registry.register(Histogram(
+    'credit_approval_request_duration_seconds',
+    'Time spent handling a request, by URL name.',
+    ['view', 'method', 'status'],
+))
+request_db_queries = registry.register(Histogram(
+    'credit_approval_request_db_queries',
+    'Database queries executed per request, by URL name.',
+    ['view'],
+    buckets=QUERY_COUNT_BUCKETS,
+))
+request_db_seconds = registry.register(Counter(
+    'credit_approval_request_db_seconds_total',
+    'Time spent in database queries, by URL name.',
+    ['view'],
+))
+eligibility_decisions = registry.register(Counter(
+    'credit_approval_eligibility_decisions_total',
+    'Loan eligibility decisions made by check_loan_eligibility.',
+    ['decision'],
+))
+
+
+def record_decisions(approved=0, rejected=0):
+    if approved:
+        eligibility_decisions.inc(approved, decision='approved')
+    if rejected:
+        eligibility_decisions.inc(rejected, decision='rejected')
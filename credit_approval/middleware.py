@@ -0,0 +1,94 @@
+# credit_approval/middleware.py
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import request_db_queries, request_db_seconds, request_latency
+from .querybudget import awatch_connections, watch_connections
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts queries and the time spent in them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, query count and query time of every request, labelled
+    with the URL name it resolved to (``unmatched`` for 404s outside the
+    URLconf). Streaming responses are timed until the view returns.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            watch_connections(stack, recorder)
+            response = self.get_response(request)
+        self.record(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        async with awatch_connections(recorder):
+            response = await self.get_response(request)
+        self.record(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, recorder, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        request_latency.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        request_db_queries.observe(recorder.queries, view=view)
+        request_db_seconds.inc(recorder.seconds, view=view)
+
+
+class AsyncRoutingMiddleware:
+    """
+    Serve requests that arrive over ASGI from ``ASYNC_ROOT_URLCONF``, which
+    routes the read endpoints to their async views. WSGI requests keep
+    ``ROOT_URLCONF``. Must come before anything that resolves URLs.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.urlconf = settings.ASYNC_ROOT_URLCONF
+        return await self.get_response(request)
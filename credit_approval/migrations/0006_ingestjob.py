@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0005_alter_loan_end_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('chunk_size', models.IntegerField()),
+                ('total_chunks', models.IntegerField(default=0)),
+                ('done_chunks', models.IntegerField(default=0)),
+                ('rows', models.IntegerField(default=0)),
+                ('rows_created', models.IntegerField(default=0)),
+                ('chunk_seconds', models.FloatField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'ingest_job',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0006_ingestjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_number', 'first_name', 'last_name', 'age', 'monthly_salary'], name='customer_identity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['loan_id'], name='loan_loan_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['customer_id', 'end_date'], include=('loan_amount',), name='loan_customer_end_date_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0007_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerCreditSummary',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_summary', serialize=False, to='credit_approval.customer')),
+                ('active_loan_sum', models.BigIntegerField(default=0)),
+                ('active_loan_count', models.IntegerField(default=0)),
+                ('current_loan_sum', models.BigIntegerField(default=0)),
+                ('loan_count', models.IntegerField(default=0)),
+                ('current_year_loan_count', models.IntegerField(default=0)),
+                ('emis_paid_on_time', models.IntegerField(default=0)),
+                ('total_emis', models.IntegerField(default=0)),
+                ('utilization', models.FloatField(default=0)),
+                ('as_of', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'customer_credit_summary',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+def analyze_loans(apps, schema_editor):
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(apps.get_model('credit_approval', 'Loan')._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE TABLE {table}' if connection.vendor == 'mysql' else f'ANALYZE {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0008_customercreditsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['customer_id', 'id'], name='loan_customer_keyset_idx'),
+        ),
+        # Existing data: let the planner see the new index is the better path
+        migrations.RunPython(analyze_loans, migrations.RunPython.noop),
+    ]
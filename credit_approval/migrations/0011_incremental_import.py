@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+def collapse_duplicate_loans(apps, schema_editor):
+    # Importing the loan sheet twice stored each row again; keep the latest
+    # copy of every (customer_id, loan_id) so the unique constraint can be built
+    Loan = apps.get_model('credit_approval', 'Loan')
+    duplicated = (Loan.objects.order_by().values('customer_id', 'loan_id')
+                  .annotate(n=models.Count('id'), last=models.Max('id')).filter(n__gt=1))
+    for row in duplicated.iterator():
+        Loan.objects.filter(customer_id=row['customer_id'], loan_id=row['loan_id']).exclude(id=row['last']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0010_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='incremental',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='rows_unchanged',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='rows_updated',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.RunPython(collapse_duplicate_loans, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='loan',
+            constraint=models.UniqueConstraint(fields=('customer_id', 'loan_id'), name='loan_customer_loan_id_uniq'),
+        ),
+    ]
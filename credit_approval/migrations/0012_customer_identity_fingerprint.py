@@ -0,0 +1,62 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:02
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+# Frozen copies of credit_approval.models.IDENTITY_FIELDS and
+# identity_fingerprint() as of this migration, so later changes to the model
+# code do not change what it backfills
+IDENTITY_FIELDS = ['first_name', 'last_name', 'age', 'monthly_salary', 'phone_number']
+
+
+def identity_fingerprint(first_name, last_name, age, monthly_salary, phone_number):
+    values = [str(first_name), str(last_name), int(age), int(monthly_salary), int(phone_number)]
+    return hashlib.blake2b(json.dumps(values).encode(), digest_size=16).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    # The oldest customer keeps the fingerprint; later duplicates stay NULL so
+    # the unique index can be built over existing data
+    Customer = apps.get_model('credit_approval', 'Customer')
+    seen = set()
+    batch = []
+    for customer in Customer.objects.order_by('customer_id').only('customer_id', *IDENTITY_FIELDS).iterator(chunk_size=2000):
+        fingerprint = identity_fingerprint(*(getattr(customer, field) for field in IDENTITY_FIELDS))
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        customer.identity_fingerprint = fingerprint
+        batch.append(customer)
+        if len(batch) == 2000:
+            Customer.objects.bulk_update(batch, ['identity_fingerprint'])
+            batch = []
+    if batch:
+        Customer.objects.bulk_update(batch, ['identity_fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0011_incremental_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='identity_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customer',
+            name='identity_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+        # Replaced by the fingerprint's unique index
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_identity_idx',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:04
+
+from datetime import date
+
+from django.db import migrations, models
+
+
+def close_ended_loans(apps, schema_editor):
+    # Before the partial indexes are built, so they only cover active loans
+    Loan = apps.get_model('credit_approval', 'Loan')
+    Loan.objects.filter(end_date__lt=date.today()).update(status='closed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0012_customer_identity_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('closed', 'Closed')], default='active', max_length=10),
+        ),
+        migrations.RunPython(close_ended_loans, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['customer_id', 'id'], include=('loan_amount', 'end_date'), name='loan_active_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['end_date'], name='loan_active_end_date_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0013_loan_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioRecomputeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('chunk_size', models.IntegerField()),
+                ('last_loan_pk', models.IntegerField(default=0)),
+                ('last_customer_id', models.IntegerField(default=0)),
+                ('loans', models.IntegerField(default=0)),
+                ('customers', models.IntegerField(default=0)),
+                ('seconds', models.FloatField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'portfolio_recompute_job',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='emis_due',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='outstanding_balance',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0014_portfolio_recompute'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='emis_paid',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='RepaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=64, unique=True)),
+                ('amount', models.FloatField()),
+                ('paid_on', models.DateField()),
+                ('due_date', models.DateField()),
+                ('on_time', models.BooleanField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='repayments', to='credit_approval.loan')),
+            ],
+            options={
+                'db_table': 'repayment_event',
+            },
+        ),
+    ]
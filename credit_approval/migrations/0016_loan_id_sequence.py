@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+# Stands in for a row hash on loans left out of the unique constraint; an
+# incremental import overwrites it like any other stale hash
+SHARED_LOAN_ID_HASH = 'shared-loan-id'
+
+
+def mark_shared_loan_ids(apps, schema_editor):
+    # Loans stored before source_hash existed, or given the same ID by
+    # concurrent create-loan requests, can share a loan ID with no hash. The
+    # oldest of each keeps its blank hash; the others are marked.
+    Loan = apps.get_model('credit_approval', 'Loan')
+    unhashed = Loan.objects.filter(source_hash='')
+    shared = (unhashed.order_by().values('loan_id')
+              .annotate(n=models.Count('id'), first=models.Min('id')).filter(n__gt=1))
+    for row in shared.iterator():
+        unhashed.filter(loan_id=row['loan_id']).exclude(id=row['first']).update(source_hash=SHARED_LOAN_ID_HASH)
+
+
+def create_sequence_row(apps, schema_editor):
+    Loan = apps.get_model('credit_approval', 'Loan')
+    LoanIdSequence = apps.get_model('credit_approval', 'LoanIdSequence')
+    LoanIdSequence.objects.create(pk=1, last_value=Loan.objects.aggregate(models.Max('loan_id'))['loan_id__max'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_approval', '0015_repayment_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'loan_id_sequence',
+            },
+        ),
+        migrations.RunPython(create_sequence_row, migrations.RunPython.noop),
+        migrations.RunPython(mark_shared_loan_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='loan',
+            constraint=models.UniqueConstraint(condition=models.Q(('source_hash', '')), fields=('loan_id',), name='loan_allocated_loan_id_uniq'),
+        ),
+    ]
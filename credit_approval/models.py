@@ -1,6 +1,18 @@
+import hashlib
+import json
+from datetime import date
+
 from django.db import models
 
 
+# Fields that identify a person for duplicate registrations
+IDENTITY_FIELDS = ['first_name', 'last_name', 'age', 'monthly_salary', 'phone_number']
+
+
+def identity_fingerprint(first_name, last_name, age, monthly_salary, phone_number):
+    values = [str(first_name), str(last_name), int(age), int(monthly_salary), int(phone_number)]
+    return hashlib.blake2b(json.dumps(values).encode(), digest_size=16).hexdigest()
+
 
 class Customer(models.Model):
     customer_id = models.AutoField(primary_key=True)
@@ -11,18 +23,66 @@ class Customer(models.Model):
     monthly_salary = models.IntegerField()
     approved_limit = models.IntegerField()
     current_debt = models.IntegerField(blank=True, null=True)
+    # Hash of the source sheet row this customer was last imported from
+    source_hash = models.CharField(max_length=32, blank=True, default='')
+    # identity_fingerprint() of IDENTITY_FIELDS; the unique index is the
+    # duplicate-registration check. NULL for older duplicates already stored.
+    identity_fingerprint = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False)
 
     
     # define table name
     class Meta:
         db_table = "customer"
         ordering = ['customer_id']
-        
-    
-    
-    
+
+    # identity_fingerprint() of the identity fields as last loaded or saved;
+    # None when unknown (e.g. fetched with .only() or written by bulk_create)
+    _saved_fingerprint = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in field_names for field in IDENTITY_FIELDS):
+            instance._saved_fingerprint = identity_fingerprint(*(getattr(instance, field) for field in IDENTITY_FIELDS))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Set on insert (bulk inserts set it themselves) and follow every later
+        # edit of an identity field, so the unique index always checks the
+        # customer's current identity
+        fingerprint = identity_fingerprint(*(getattr(self, field) for field in IDENTITY_FIELDS))
+        if self._state.adding:
+            changed = self.identity_fingerprint is None
+        elif self._saved_fingerprint is not None:
+            changed = fingerprint != self._saved_fingerprint
+        else:
+            # Older duplicates keep their NULL fingerprint
+            changed = self.identity_fingerprint not in (None, fingerprint)
+        if changed:
+            self.identity_fingerprint = fingerprint
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and set(update_fields) & set(IDENTITY_FIELDS):
+                kwargs['update_fields'] = {*update_fields, 'identity_fingerprint'}
+        super().save(*args, **kwargs)
+        self._saved_fingerprint = fingerprint
+
+
+
+def loan_status(end_date, today=None):
+    # Open-ended loans never close; the others close the day after end_date
+    if end_date is not None and end_date < (today or date.today()):
+        return Loan.STATUS_CLOSED
+    return Loan.STATUS_ACTIVE
+
 
 class Loan(models.Model):
+    STATUS_ACTIVE = 'active'
+    STATUS_CLOSED = 'closed'
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_CLOSED, 'Closed'),
+    ]
+
     id=models.AutoField(primary_key=True)
     customer_id = models.ForeignKey(Customer, on_delete=models.CASCADE)
     loan_id = models.IntegerField()
@@ -33,10 +93,178 @@ class Loan(models.Model):
     emis_paid_on_time = models.IntegerField()
     start_date = models.DateField(blank=True, null=True)
     end_date = models.DateField(blank=True, null=True,)
+    # Hash of the source sheet row this loan was last imported from
+    source_hash = models.CharField(max_length=32, blank=True, default='')
+    # loan_status() as of the last write; the close_expired_loans job closes
+    # loans whose end_date has passed since. A closed loan always has
+    # end_date < today, so "active" queries filter on both and only ever
+    # read the rows of the partial index below.
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    # Installments fallen due and scheduled principal still owed, as of the
+    # last recompute_portfolio run (see PortfolioRecomputeJob)
+    emis_due = models.IntegerField(default=0)
+    outstanding_balance = models.IntegerField(blank=True, null=True)
+    # Installments recorded by repayment events (see RepaymentEvent)
+    emis_paid = models.IntegerField(default=0)
 
  
     class Meta:
         db_table = "loan"
         ordering = ['customer_id']
+        indexes = [
+            # view-loan/<loan_id>/ lookups
+            models.Index(fields=['loan_id'], name='loan_loan_id_idx'),
+            # Active-loan filters per customer; loan_amount is carried in the
+            # index (PostgreSQL) so the eligibility sum is an index-only scan
+            models.Index(fields=['customer_id', 'end_date'], include=['loan_amount'], name='loan_customer_end_date_idx'),
+            # Keyset pagination of view-loans/<customer_id>/ on (customer_id, id)
+            models.Index(fields=['customer_id', 'id'], name='loan_customer_keyset_idx'),
+            # Active loans only: view-loans pages and active-loan sums per
+            # customer, and the close_expired_loans sweep by end_date
+            models.Index(fields=['customer_id', 'id'], include=['loan_amount', 'end_date'],
+                         condition=models.Q(status='active'), name='loan_active_customer_idx'),
+            models.Index(fields=['end_date'], condition=models.Q(status='active'), name='loan_active_end_date_idx'),
+        ]
+        constraints = [
+            # Natural key of the loan sheet; incremental imports upsert on it
+            models.UniqueConstraint(fields=['customer_id', 'loan_id'], name='loan_customer_loan_id_uniq'),
+            # The sheet repeats loan IDs across customers, but an ID handed out
+            # by create-loan (no source_hash) belongs to one loan only
+            models.UniqueConstraint(fields=['loan_id'], condition=models.Q(source_hash=''),
+                                    name='loan_allocated_loan_id_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Bulk writes set the status themselves (see importers.bulk_import)
+        self.status = loan_status(self.end_date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'end_date' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'status'}
+        super().save(*args, **kwargs)
 
     
+
+
+class LoanIdSequence(models.Model):
+    # The last loan_id handed out by services.next_loan_id. One row, whose
+    # row lock serializes allocations across all customers.
+    last_value = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "loan_id_sequence"
+
+
+class CustomerCreditSummary(models.Model):
+    # Denormalized loan aggregates per customer, as of a given day. Kept in
+    # sync by loan signals and the importers; rebuild with
+    # `python manage.py rebuild_credit_summaries`.
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_summary')
+    active_loan_sum = models.BigIntegerField(default=0)
+    active_loan_count = models.IntegerField(default=0)
+    current_loan_sum = models.BigIntegerField(default=0)
+    loan_count = models.IntegerField(default=0)
+    current_year_loan_count = models.IntegerField(default=0)
+    emis_paid_on_time = models.IntegerField(default=0)
+    total_emis = models.IntegerField(default=0)
+    # current_loan_sum / approved_limit
+    utilization = models.FloatField(default=0)
+    as_of = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "customer_credit_summary"
+
+
+class IngestJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    chunk_size = models.IntegerField()
+    total_chunks = models.IntegerField(default=0)
+    done_chunks = models.IntegerField(default=0)
+    rows = models.IntegerField(default=0)
+    incremental = models.BooleanField(default=False)
+    rows_created = models.IntegerField(default=0)
+    rows_updated = models.IntegerField(default=0)
+    rows_unchanged = models.IntegerField(default=0)
+    # Sum of the time spent inside chunk tasks, across all workers
+    chunk_seconds = models.FloatField(default=0)
+    error = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = "ingest_job"
+        ordering = ['-id']
+
+
+class IdempotencyRecord(models.Model):
+    # Response stored for an Idempotency-Key, replayed when a client retries
+    # the same request. request_hash catches a key reused for another request.
+    endpoint = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.IntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "idempotency_record"
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'key'], name='idempotency_endpoint_key_uniq'),
+        ]
+
+
+class PortfolioRecomputeJob(models.Model):
+    # One run of services.recompute_portfolio. The checkpoints are the last
+    # loan / customer written; a failed or interrupted run resumes after them.
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    as_of = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    chunk_size = models.IntegerField()
+    last_loan_pk = models.IntegerField(default=0)
+    last_customer_id = models.IntegerField(default=0)
+    loans = models.IntegerField(default=0)
+    customers = models.IntegerField(default=0)
+    # Time spent writing, summed over every run that worked on the job
+    seconds = models.FloatField(default=0)
+    error = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = "portfolio_recompute_job"
+        ordering = ['-id']
+
+
+class RepaymentEvent(models.Model):
+    # One EMI payment, as received by /repayments/ or `manage.py
+    # ingest_repayments`. The unique event_id makes a replayed event a no-op.
+    event_id = models.CharField(max_length=64, unique=True)
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='repayments')
+    amount = models.FloatField()
+    paid_on = models.DateField()
+    due_date = models.DateField()
+    # paid_on <= due_date; counted into Loan.emis_paid_on_time
+    on_time = models.BooleanField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "repayment_event"
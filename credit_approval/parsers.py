@@ -0,0 +1,48 @@
+# credit_approval/parsers.py
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class JSONLinesParser(BaseParser):
+    """
+    Parses a JSON Lines (newline-delimited JSON) body into a list of objects.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        items = []
+        for number, line in enumerate(stream, start=1):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError(f'JSON Lines parse error on line {number} - {exc}')
+        return items
+
+
+class JSONLParser(JSONLinesParser):
+    media_type = 'application/jsonl'
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a CSV body with a header row into a list of dicts of strings.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return list(csv.DictReader(codecs.iterdecode(stream, encoding)))
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ParseError(f'CSV parse error - {exc}')
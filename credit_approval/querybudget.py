@@ -0,0 +1,225 @@
+# credit_approval/querybudget.py
+import contextvars
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from celery import current_task
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Numbers in IN (...) lists vary with the batch size; fold them so one
+# statement run with different list lengths still counts as the same SQL
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+# Transaction control is issued by atomic() itself (e.g. BEGIN on SQLite
+# outside tests); it is not work the view asked for
+_TRANSACTION_CONTROL = re.compile(r'\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries, max_repeats=1, per_batch=0):
+    """
+    Declare how many queries a view may run per request, and how many times
+    any one SQL statement may repeat (more than once usually means N+1).
+    Apply it above ``@api_view``.
+
+    Bulk endpoints whose cost grows with the body also pass ``per_batch`` and
+    report each batch they run with :func:`charge_batches`: every batch adds
+    ``per_batch`` queries to ``max_queries`` and lets each statement run once more.
+    """
+    def decorator(view):
+        view.query_budget = {'max_queries': max_queries, 'max_repeats': max_repeats, 'per_batch': per_batch}
+        return view
+    return decorator
+
+
+def normalize_sql(sql):
+    return _PLACEHOLDER_LIST.sub('(%s, ...)', sql)
+
+
+class QueryLog:
+    """
+    ``execute_wrapper`` that keeps the SQL of every query. Queries run by a
+    Celery task (eagerly, inside the request) are left out: they belong to
+    the task, not the endpoint.
+    """
+
+    def __init__(self):
+        self.statements = []
+        # Reported by charge_batches()
+        self.batches = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not current_task and not _TRANSACTION_CONTROL.match(sql):
+            self.statements.append(normalize_sql(sql))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.statements)
+
+    def repeated(self):
+        return {sql: n for sql, n in Counter(self.statements).items() if n > 1}
+
+
+def watch_connections(stack, wrapper):
+    """Install ``wrapper`` on this thread's connections until ``stack`` closes."""
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+# Wrappers of the async request whose context a query runs in
+_context_wrappers = contextvars.ContextVar('query_wrappers', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    for wrapper in _context_wrappers.get():
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def _install_dispatch():
+    for connection in connections.all():
+        if _dispatch not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, _dispatch)
+
+
+@asynccontextmanager
+async def awatch_connections(wrapper):
+    """
+    Async counterpart of :func:`watch_connections`. Concurrent async requests
+    can share the thread the ORM runs their queries on, so a per-request
+    ``execute_wrapper()`` there would see the other requests' queries. One
+    dispatcher stays installed on that thread instead and passes each query
+    to the wrappers of the request (context) that ran it.
+    """
+    await sync_to_async(_install_dispatch)()
+    token = _context_wrappers.set(_context_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _context_wrappers.reset(token)
+
+
+def charge_batches(batches=1):
+    """
+    Report ``batches`` batches run by the current request to the query logs
+    watching it, for views declared with ``@query_budget(..., per_batch=n)``.
+    Called by the views, from the counts their services return; does nothing
+    when no log is watching.
+    """
+    wrappers = [*_context_wrappers.get()]
+    for connection in connections.all(initialized_only=True):
+        wrappers.extend(connection.execute_wrappers)
+    # A log watching several connections is charged once
+    for log in {id(wrapper): wrapper for wrapper in wrappers if isinstance(wrapper, QueryLog)}.values():
+        log.batches += batches
+
+
+@contextmanager
+def capture_queries():
+    log = QueryLog()
+    with ExitStack() as stack:
+        watch_connections(stack, log)
+        yield log
+
+
+def budget_violations(log, budget):
+    """Human-readable list of the ways ``log`` breaks ``budget``."""
+    violations = []
+    batches = log.batches if budget.get('per_batch') else 0
+    max_queries = budget['max_queries'] + budget.get('per_batch', 0) * batches
+    max_repeats = max(budget['max_repeats'], batches)
+    if len(log) > max_queries:
+        violations.append(f"{len(log)} queries, budget is {max_queries}")
+    for sql, n in log.repeated().items():
+        if n > max_repeats:
+            violations.append(f"same SQL ran {n} times (allowed {max_repeats}): {sql}")
+    return violations
+
+
+def endpoint_budgets(resolver=None):
+    """``url_name -> budget`` for every named route (``None`` if undeclared)."""
+    budgets = {}
+    patterns = list((resolver or get_resolver()).url_patterns)
+    while patterns:
+        pattern = patterns.pop()
+        if isinstance(pattern, URLResolver):
+            if pattern.app_name == 'admin':
+                continue
+            patterns.extend(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            budgets[pattern.name] = getattr(pattern.callback, 'query_budget', None)
+    return budgets
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin: ``with self.assertQueryBudget('url_name'): ...``"""
+
+    @contextmanager
+    def assertQueryBudget(self, url_name):
+        budget = endpoint_budgets()[url_name]
+        if budget is None:
+            self.fail(f'{url_name} has no query budget')
+        with capture_queries() as log:
+            yield log
+        violations = budget_violations(log, budget)
+        if violations:
+            raise QueryBudgetExceeded(f'{url_name}: ' + '; '.join(violations) + '\n' + '\n'.join(log.statements))
+
+
+class QueryBudgetMiddleware:
+    """
+    Check every request against its view's ``@query_budget``.
+
+    ``QUERY_BUDGET_MODE`` is ``'warn'`` (log a warning), ``'raise'`` (raise
+    :class:`QueryBudgetExceeded`) or ``'off'`` (middleware is skipped).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+        if self.mode not in ('warn', 'raise'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with capture_queries() as log:
+            response = self.get_response(request)
+        self.check(request, log)
+        return response
+
+    async def __acall__(self, request):
+        log = QueryLog()
+        async with awatch_connections(log):
+            response = await self.get_response(request)
+        self.check(request, log)
+        return response
+
+    def check(self, request, log):
+        match = getattr(request, 'resolver_match', None)
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        if budget is not None:
+            violations = budget_violations(log, budget)
+            if violations:
+                message = f'Query budget exceeded by {match.url_name}: ' + '; '.join(violations)
+                if self.mode == 'raise':
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
@@ -0,0 +1,86 @@
+# credit_approval/rendering.py
+#
+# Serializer-free rendering of the loan read endpoints. DRF serializers walk
+# their fields one object at a time; here each shape is compiled once into an
+# itemgetter over the .values() / .values_list() row plus one cast per field,
+# mirroring the serializer field's to_representation (IntegerField -> int,
+# FloatField -> float, CharField -> str). The output is the same dicts, so the
+# rendered JSON is byte-for-byte what the serializers produce.
+from operator import itemgetter
+
+from rest_framework import serializers
+
+from .serializers import CustomerSerializer, LoanDetailsCustomerSerializer, LoanDetailsSerializer
+
+# Serializer field class -> the cast its to_representation applies
+FIELD_CASTS = {
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+    serializers.CharField: str,
+}
+
+
+class RowMapper:
+    """
+    Maps a row (tuple or dict) to the dict a serializer would output.
+
+    ``fields`` is ``[(name, source, cast), ...]`` in output order; ``source``
+    is the row index or key to read. ``None`` values stay ``None``, as in
+    ``Serializer.to_representation``.
+    """
+
+    def __init__(self, fields):
+        self.names = tuple(name for name, _, _ in fields)
+        self.casts = tuple(cast for _, _, cast in fields)
+        getter = itemgetter(*(source for _, source, _ in fields))
+        # itemgetter returns a bare value, not a 1-tuple, for a single source
+        self.getter = getter if len(fields) > 1 else lambda row: (getter(row),)
+
+    @classmethod
+    def for_serializer(cls, serializer_class, sources=None):
+        """
+        Mapper with ``serializer_class``'s fields, in its order. ``sources``
+        maps a field name to its row index or key (default: the name). A
+        nested serializer's entry is ``(source, RowMapper)``, e.g. a slice of
+        the row and a mapper over that slice.
+        """
+        sources = sources or {}
+        fields = []
+        for name, field in serializer_class().fields.items():
+            source = sources.get(name, name)
+            if isinstance(field, serializers.BaseSerializer):
+                source, cast = source
+            else:
+                cast = FIELD_CASTS[type(field)]
+            fields.append((name, source, cast))
+        return cls(fields)
+
+    def __call__(self, row):
+        return dict(zip(self.names, [
+            None if value is None else cast(value) for cast, value in zip(self.casts, self.getter(row))
+        ]))
+
+    def many(self, rows):
+        return [self(row) for row in rows]
+
+
+def positions(columns, start=0):
+    """``{column: index}`` for columns read by position from a ``values_list()`` row."""
+    return {column: index for index, column in enumerate(columns, start)}
+
+
+# view-loan: Loan.objects.values_list(*LOAN_DETAIL_COLUMNS); the customer's
+# columns are in CustomerSerializer's field order
+CUSTOMER_COLUMNS = ['customer_id', 'customer_id__first_name', 'customer_id__last_name',
+                    'customer_id__phone_number', 'customer_id__age']
+LOAN_DETAIL_COLUMNS = ['loan_id', *CUSTOMER_COLUMNS, 'loan_amount', 'interest_rate', 'monthly_repayment', 'tenure']
+
+loan_detail = RowMapper.for_serializer(LoanDetailsSerializer, sources={
+    'customer': (slice(1, 1 + len(CUSTOMER_COLUMNS)),
+                 RowMapper.for_serializer(CustomerSerializer, sources=positions(CustomerSerializer.Meta.fields))),
+    **positions(['loan_amount', 'interest_rate', 'monthly_installment', 'tenure'], start=1 + len(CUSTOMER_COLUMNS)),
+    'loan_id': 0,
+})
+
+# view-loans: the .values() rows of services.active_loans_queryset
+active_loan = RowMapper.for_serializer(LoanDetailsCustomerSerializer)
@@ -0,0 +1,289 @@
+# credit_approval/repayments.py
+#
+# Bulk ingestion of EMI repayment events, for POST /repayments/ and
+# `manage.py ingest_repayments`. Each event is one installment paid on one
+# loan. Events are validated with plain conversions rather than a serializer
+# per row, deduped on event_id against RepaymentEvent, and applied a batch at
+# a time: one INSERT for the events and one UPDATE per table, each sent
+# through executemany.
+import csv
+import json
+import time
+from collections import Counter
+from datetime import date
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from .amortization import outstanding_balances
+from .models import Customer, CustomerCreditSummary, Loan, RepaymentEvent
+from .services import bulk_increment_rows, bulk_insert_rows, bulk_update_rows, customer_debt, lock_customers
+
+# Events applied per transaction
+DEFAULT_BATCH_SIZE = 10000
+
+# Queries applying one batch: customer lock, event and loan lookups, one
+# executemany each for events, loans and summaries, and the debt update
+QUERIES_PER_BATCH = 7
+
+EVENT_ID_MAX_LENGTH = RepaymentEvent._meta.get_field('event_id').max_length
+
+# SQLSTATEs of a transaction PostgreSQL rolled back to break a deadlock or a
+# serialization conflict; the batch can simply run again
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+
+
+def _retryable(error):
+    cause = error.__cause__
+    # psycopg 3 names it sqlstate, psycopg2 pgcode
+    return getattr(cause, 'sqlstate', getattr(cause, 'pgcode', None)) in RETRYABLE_SQLSTATES
+
+
+def _event_id(value):
+    value = str(value).strip()
+    if not value:
+        raise ValueError('This field may not be blank.')
+    if len(value) > EVENT_ID_MAX_LENGTH:
+        raise ValueError(f'Ensure this field has no more than {EVENT_ID_MAX_LENGTH} characters.')
+    return value
+
+
+def _integer(value):
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError
+            return int(value)
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('A valid integer is required.')
+
+
+def _amount(value):
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('A valid number is required.')
+    if not 0 < amount < float('inf'):
+        raise ValueError('Ensure this value is greater than 0.')
+    return amount
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError('Date has wrong format. Use one of these formats instead: YYYY-MM-DD.')
+
+
+# Fields of an event, in the order of a cleaned row
+EVENT_FIELDS = {
+    'event_id': _event_id,
+    'customer_id': _integer,
+    'loan_id': _integer,
+    'amount': _amount,
+    'paid_on': _date,
+    'due_date': _date,
+}
+
+
+def clean_event(raw):
+    """
+    Validate one event (a JSON object or CSV row). Returns ``(row, None)``
+    with ``row`` ordered like :data:`EVENT_FIELDS`, or ``(None, errors)``
+    with errors keyed by field as a serializer would report them.
+    """
+    if not isinstance(raw, dict):
+        return None, {api_settings.NON_FIELD_ERRORS_KEY: ['Invalid data. Expected a dictionary.']}
+    row = []
+    errors = {}
+    for field, convert in EVENT_FIELDS.items():
+        value = raw.get(field)
+        if value is None or value == '':
+            errors[field] = ['This field is required.']
+            continue
+        try:
+            row.append(convert(value))
+        except ValueError as e:
+            errors[field] = [str(e)]
+    return (None, errors) if errors else (tuple(row), None)
+
+
+def apply_events(events, today=None, attempts=3):
+    """
+    Record and apply one batch of cleaned events, given as ``(index, row)``
+    pairs, in one transaction.
+
+    An event whose ``event_id`` is already recorded (or repeats earlier in
+    the batch) is a duplicate and changes nothing. An event for an unknown
+    loan, or paying less than the loan's ``monthly_repayment``, is rejected
+    and not recorded, so it can be sent again once the loan exists or with
+    the full amount. Each loan gains its events in ``emis_paid`` and its on-time
+    ones in ``emis_paid_on_time`` (both capped at the tenure), and its
+    ``outstanding_balance`` is recomputed as of ``today``; each customer's
+    ``current_debt`` and credit summary ``emis_paid_on_time`` follow. Returns ``{'applied',
+    'duplicates', 'rejected', 'attempts'}``, ``rejected`` being ``[{'index', 'errors'}]``.
+
+    The batch is retried, up to ``attempts`` times in all, when a concurrent
+    batch wins an event ID or the database aborts it for a deadlock or a
+    serialization failure.
+    """
+    today = today or date.today()
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return dict(_apply_events(events, today), attempts=attempt + 1)
+        except IntegrityError:
+            # A concurrent batch recorded one of the event IDs first; dedupe again
+            if attempt == attempts - 1:
+                raise
+        except OperationalError as e:
+            if not _retryable(e) or attempt == attempts - 1:
+                raise
+
+
+def _apply_events(events, today):
+    result = {'applied': 0, 'duplicates': 0, 'rejected': []}
+    if not events:
+        return result
+
+    # Lock first: the customers stay locked until commit (PostgreSQL), and
+    # SQLite takes its write lock before anything below is read. create-loan
+    # locks the same rows.
+    customer_ids = {row[1] for _, row in events}
+    lock_customers(customer_ids)
+
+    recorded = set(RepaymentEvent.objects.filter(
+        event_id__in=[row[0] for _, row in events]
+    ).values_list('event_id', flat=True))
+    candidates = Loan.objects.filter(customer_id__in=customer_ids, loan_id__in={row[2] for _, row in events})
+    loans = {
+        (customer_id, loan_id): rest
+        for customer_id, loan_id, *rest in candidates.order_by().values_list(
+            'customer_id', 'loan_id', 'id', 'loan_amount', 'interest_rate', 'tenure', 'start_date',
+            'emis_paid', 'emis_paid_on_time', 'monthly_repayment',
+        )
+    }
+
+    adapt_date = connection.ops.adapt_datefield_value
+    received_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    inserts = []
+    paid = Counter()
+    paid_on_time = Counter()
+    for index, (event_id, customer_id, loan_id, amount, paid_on, due_date) in events:
+        if event_id in recorded:
+            result['duplicates'] += 1
+            continue
+        loan = loans.get((customer_id, loan_id))
+        if loan is None:
+            result['rejected'].append({'index': index, 'errors': {'loan_id': [
+                f'Loan {loan_id} of customer {customer_id} does not exist.'
+            ]}})
+            continue
+        if amount < loan[7]:
+            # Partial payments are not tracked; one event is one whole EMI
+            result['rejected'].append({'index': index, 'errors': {'amount': [
+                f'Ensure this value is at least the monthly installment of loan {loan_id} ({loan[7]}).'
+            ]}})
+            continue
+        recorded.add(event_id)
+        on_time = paid_on <= due_date
+        inserts.append((event_id, loan[0], amount, adapt_date(paid_on), adapt_date(due_date), on_time, received_at))
+        paid[(customer_id, loan_id)] += 1
+        paid_on_time[(customer_id, loan_id)] += on_time
+    if not inserts:
+        return result
+
+    bulk_insert_rows(RepaymentEvent, ['event_id', 'loan', 'amount', 'paid_on', 'due_date', 'on_time', 'received_at'],
+                     inserts)
+
+    keys = list(paid)
+    pks, amounts, rates, tenures, starts, paid_before, on_time_before, _ = zip(*(loans[key] for key in keys))
+    emis_paid = [min(before + paid[key], tenure) for key, before, tenure in zip(keys, paid_before, tenures)]
+    emis_paid_on_time = [min(before + paid_on_time[key], tenure)
+                         for key, before, tenure in zip(keys, on_time_before, tenures)]
+    balances, payments_due = outstanding_balances(amounts, rates, tenures, starts, today, emis_paid)
+    bulk_update_rows(Loan, ['emis_paid', 'emis_paid_on_time', 'emis_due', 'outstanding_balance'], zip(
+        pks, emis_paid, emis_paid_on_time, payments_due.tolist(), [round(balance) for balance in balances.tolist()]
+    ))
+
+    # Summaries sum emis_paid_on_time over the customer's loans, so they move
+    # by what the loans gained; a missing one is built on its next read
+    gained = Counter()
+    for key, before, after in zip(keys, on_time_before, emis_paid_on_time):
+        gained[key[0]] += after - before
+    increments = [(customer_id, n) for customer_id, n in gained.items() if n]
+    if increments:
+        bulk_increment_rows(CustomerCreditSummary, ['emis_paid_on_time'], increments)
+    # Debt follows the new balances. Credit scores read only active loan sums
+    # and counts, which repayments leave alone, so cached scores stay valid.
+    Customer.objects.filter(customer_id__in=list(gained)).update(current_debt=customer_debt())
+
+    result['applied'] = len(inserts)
+    return result
+
+
+def ingest_events(items, batch_size=DEFAULT_BATCH_SIZE, today=None, progress=None):
+    """
+    Validate and apply an iterable of raw events, ``batch_size`` per
+    transaction. ``progress(stats)`` is called after each batch. Returns
+    ``{'received', 'applied', 'duplicates', 'rejected', 'transactions',
+    'seconds', 'events_per_second'}``; ``rejected`` lists ``{'index',
+    'errors'}`` with indexes into ``items``, and ``transactions`` counts the
+    batch transactions run, retries included.
+    """
+    started = time.perf_counter()
+    stats = {'received': 0, 'applied': 0, 'duplicates': 0, 'rejected': [], 'transactions': 0}
+
+    def flush(batch):
+        result = apply_events(batch, today)
+        stats['transactions'] += result['attempts']
+        stats['applied'] += result['applied']
+        stats['duplicates'] += result['duplicates']
+        stats['rejected'].extend(result['rejected'])
+        if progress is not None:
+            progress(stats)
+
+    batch = []
+    for index, raw in enumerate(items):
+        stats['received'] += 1
+        row, errors = clean_event(raw)
+        if errors:
+            stats['rejected'].append({'index': index, 'errors': errors})
+            continue
+        batch.append((index, row))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    stats['rejected'].sort(key=lambda item: item['index'])
+    seconds = time.perf_counter() - started
+    stats['seconds'] = round(seconds, 3)
+    stats['events_per_second'] = round(stats['received'] / seconds, 1) if seconds else 0.0
+    return stats
+
+
+def read_events(path):
+    """
+    Lazily yield the raw events of a ``.csv`` file (with a header row) or a
+    JSON Lines file (any other extension), one per row or line.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            yield from csv.DictReader(f)
+            return
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f'{path}: JSON Lines parse error on line {number} - {e}')
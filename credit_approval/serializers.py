@@ -1,7 +1,10 @@
 # credit_approval/serializers.py
 from datetime import datetime
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Customer,Loan
+from rest_framework.settings import api_settings
+from .models import Customer,Loan,IngestJob
 from django.db.models import Sum
 from django.db.models import Sum, Value
 from django.db.models.functions import Coalesce
@@ -17,15 +20,9 @@ class CustomerRegistrationSerializer(serializers.ModelSerializer):
         
 
     def validate(self, data):
-        first_name = data['first_name']
-        last_name = data['last_name']
         age = data['age']
-        monthly_salary = data['monthly_salary']
-        phone_number = data['phone_number']
 
-        # Check if the customer already exists
-        if Customer.objects.filter(first_name=first_name, last_name=last_name, age=age, monthly_salary=monthly_salary, phone_number=phone_number).exists():
-            raise serializers.ValidationError(f"Customer with name {first_name} {last_name} already exists")
+        # Duplicates are caught by the identity fingerprint's unique index in create()
 
         # Check if the age is between 18 and 60
         if age < 18 or age > 60:
@@ -43,8 +40,20 @@ class CustomerRegistrationSerializer(serializers.ModelSerializer):
         # Calculate approved_limit using the provided formula
         approved_limit = round(36 * monthly_income / 100000) * 100000
 
-        # Create a new customer with the calculated approved_limit
-        customer = Customer.objects.create(approved_limit=approved_limit, **validated_data)
+        # Create a new customer with the calculated approved_limit; concurrent
+        # registrations of the same person cannot both pass the unique index
+        customer = Customer(approved_limit=approved_limit, **validated_data)
+        try:
+            with transaction.atomic():
+                customer.save()
+        except IntegrityError:
+            # Only the fingerprint's index means a duplicate; anything else
+            # (e.g. a customer_id sequence behind the table) is a real error
+            if not Customer.objects.filter(identity_fingerprint=customer.identity_fingerprint).exists():
+                raise
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                f"Customer with name {validated_data['first_name']} {validated_data['last_name']} already exists"
+            ]})
 
         # Prepare the response body
         response_data = {
@@ -123,9 +132,36 @@ class CreateLoanRequestSerializer(serializers.Serializer):
 
 
 class CreateLoanResponseSerializer(serializers.Serializer):
-    loan_id = serializers.IntegerField()
+    loan_id = serializers.IntegerField(allow_null=True)
     customer_id = serializers.IntegerField()
+    loan_approved = serializers.BooleanField()
+    message = serializers.CharField()
     loan_amount = serializers.FloatField()
     interest_rate = serializers.FloatField()
     tenure = serializers.IntegerField()
-    monthly_installment = serializers.FloatField()
\ No newline at end of file
+    monthly_installment = serializers.FloatField()
+
+
+class IngestJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.IntegerField(source='id')
+    elapsed_seconds = serializers.SerializerMethodField()
+    rows_per_second = serializers.SerializerMethodField()
+    chunk_rows_per_second = serializers.SerializerMethodField()
+
+    class Meta:
+        model = IngestJob
+        fields = ['job_id', 'status', 'chunk_size', 'total_chunks', 'done_chunks', 'incremental', 'rows', 'rows_created',
+                  'rows_updated', 'rows_unchanged', 'elapsed_seconds', 'rows_per_second', 'chunk_rows_per_second', 'error', 'started_at', 'finished_at']
+
+    def get_elapsed_seconds(self, job):
+        end = job.finished_at or timezone.now()
+        return round((end - job.started_at).total_seconds(), 3)
+
+    def get_rows_per_second(self, job):
+        # Wall-clock throughput of the whole job, across all workers
+        elapsed = self.get_elapsed_seconds(job)
+        return round(job.rows / elapsed, 1) if elapsed else 0.0
+
+    def get_chunk_rows_per_second(self, job):
+        # Average throughput of a single chunk task
+        return round(job.rows / job.chunk_seconds, 1) if job.chunk_seconds else 0.0
@@ -0,0 +1,504 @@
+# credit_approval/services.py
+import hashlib
+import json
+import time
+from datetime import date
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models import AutoField, Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, Greatest, Least
+from django.utils import timezone
+
+from .amortization import outstanding_balances
+
+from .cache import credit_score_cache, response_cache
+from .models import (
+    Customer,
+    CustomerCreditSummary,
+    IdempotencyRecord,
+    Loan,
+    LoanIdSequence,
+    PortfolioRecomputeJob,
+)
+
+SUMMARY_FIELDS = [
+    'active_loan_sum',
+    'active_loan_count',
+    'current_loan_sum',
+    'loan_count',
+    'current_year_loan_count',
+    'emis_paid_on_time',
+    'total_emis',
+]
+
+# bulk_create() options that turn an insert into an upsert on the customer
+SUMMARY_UPSERT = {
+    'update_conflicts': True,
+    'unique_fields': ['customer'],
+    'update_fields': SUMMARY_FIELDS + ['utilization', 'as_of', 'updated_at'],
+}
+
+
+def credit_snapshot_queryset(today=None):
+    """
+    Customers annotated with everything an eligibility decision needs.
+
+    ``active_loan_sum``/``active_loan_count`` follow ``calculate_credit_score``
+    (loans ending today or later), ``current_loan_sum`` follows the limit check
+    in ``check_loan_eligibility`` (loans not yet ended, open-ended included).
+    """
+    today = today or date.today()
+    # status narrows to open loans; the dates still decide between close_expired_loans runs
+    open_loans = Q(loan__status=Loan.STATUS_ACTIVE)
+    active = open_loans & Q(loan__end_date__gte=today)
+    current = open_loans & (Q(loan__end_date__gte=today) | Q(loan__end_date__isnull=True))
+    return Customer.objects.annotate(
+        active_loan_sum=Sum('loan__loan_amount', filter=active),
+        active_loan_count=Count('loan', filter=active),
+        current_loan_sum=Sum('loan__loan_amount', filter=current),
+        loan_count=Count('loan'),
+        current_year_loan_count=Count('loan', filter=Q(loan__start_date__year=today.year)),
+        emis_paid_on_time=Sum('loan__emis_paid_on_time'),
+        total_emis=Sum('loan__tenure'),
+    )
+
+
+def get_credit_snapshot(customer_id, today=None):
+    """
+    Fetch a customer together with their loan aggregates.
+
+    Reads the customer's ``CustomerCreditSummary`` row in the same query; the
+    ``Loan`` table is only aggregated when the summary is missing or was built
+    on an earlier day. Returns the ``Customer`` with the summary fields set as
+    attributes, or ``None`` if it does not exist.
+    """
+    return get_credit_snapshots([customer_id], today).get(customer_id)
+
+
+def get_credit_snapshots(customer_ids, today=None, stats=None):
+    """
+    Batch version of :func:`get_credit_snapshot`.
+
+    One query reads the customers with their summaries; customers whose
+    summary is missing or stale are re-aggregated together in one more query,
+    and their summaries upserted. Returns a dict of ``customer_id ->
+    Customer``; unknown IDs are left out. A ``stats`` dict, if given, gets
+    ``summary_inserts``: the INSERT statements of that upsert.
+    """
+    today = today or date.today()
+    snapshots = {}
+    stale = []
+    for customer in Customer.objects.select_related('credit_summary').filter(customer_id__in=set(customer_ids)):
+        try:
+            summary = customer.credit_summary
+        except CustomerCreditSummary.DoesNotExist:
+            summary = None
+        if summary is None or summary.as_of != today:
+            stale.append(customer.customer_id)
+            continue
+        for field in SUMMARY_FIELDS + ['utilization']:
+            setattr(customer, field, getattr(summary, field))
+        snapshots[customer.customer_id] = customer
+
+    if stale:
+        summaries = []
+        for customer in credit_snapshot_queryset(today).filter(customer_id__in=stale):
+            summary = build_summary(customer, today)
+            for field in SUMMARY_FIELDS + ['utilization']:
+                setattr(customer, field, getattr(summary, field))
+            summaries.append(summary)
+            snapshots[customer.customer_id] = customer
+        save_summaries(summaries)
+    if stats is not None:
+        stats['summary_inserts'] = insert_statements(CustomerCreditSummary, summaries if stale else [])
+
+    return snapshots
+
+
+async def aget_credit_snapshot(customer_id, today=None):
+    """Async ORM version of :func:`get_credit_snapshot` for the async views."""
+    today = today or date.today()
+    customer = await Customer.objects.select_related('credit_summary').filter(customer_id=customer_id).afirst()
+    if customer is None:
+        return None
+    try:
+        summary = customer.credit_summary
+    except CustomerCreditSummary.DoesNotExist:
+        summary = None
+
+    if summary is None or summary.as_of != today:
+        customer = await credit_snapshot_queryset(today).filter(customer_id=customer_id).afirst()
+        if customer is None:
+            # Deleted between the two reads
+            return None
+        summary = build_summary(customer, today)
+        await CustomerCreditSummary.objects.abulk_create([summary], **SUMMARY_UPSERT)
+    for field in SUMMARY_FIELDS + ['utilization']:
+        setattr(customer, field, getattr(summary, field))
+    return customer
+
+
+def build_summary(snapshot, today):
+    values = {field: getattr(snapshot, field) or 0 for field in SUMMARY_FIELDS}
+    limit = snapshot.approved_limit
+    return CustomerCreditSummary(
+        customer=snapshot,
+        utilization=values['current_loan_sum'] / limit if limit else 0.0,
+        as_of=today,
+        **values,
+    )
+
+
+def insert_statements(model, objs):
+    # INSERT statements bulk_create (without batch_size) splits objs into on this backend
+    if not objs:
+        return 0
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, AutoField)]
+    return -(-len(objs) // max(connection.ops.bulk_batch_size(fields, objs), 1))
+
+
+def save_summaries(summaries):
+    CustomerCreditSummary.objects.bulk_create(summaries, **SUMMARY_UPSERT)
+
+
+def refresh_credit_summary(customer_id, today=None):
+    """Recompute one customer's summary from ``Loan``; returns it (or ``None``)."""
+    today = today or date.today()
+    snapshot = credit_snapshot_queryset(today).filter(customer_id=customer_id).first()
+    if snapshot is None:
+        return None
+    summary = build_summary(snapshot, today)
+    save_summaries([summary])
+    return summary
+
+
+def rebuild_credit_summaries(customer_ids=None, chunk_size=1000, today=None):
+    """
+    Recompute summaries for ``customer_ids`` (or every customer) in chunks.
+
+    Returns the number of summaries written.
+    """
+    today = today or date.today()
+    queryset = credit_snapshot_queryset(today)
+    if customer_ids is not None:
+        queryset = queryset.filter(customer_id__in=list(customer_ids))
+
+    written = 0
+    batch = []
+    for snapshot in queryset.iterator(chunk_size=chunk_size):
+        batch.append(build_summary(snapshot, today))
+        if len(batch) >= chunk_size:
+            save_summaries(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        save_summaries(batch)
+        written += len(batch)
+    return written
+
+
+def invalidate_credit_scores(customer_ids, today=None):
+    # Scores are cached per (customer, day); only today's entry can still be read
+    today = today or date.today()
+    credit_score_cache.delete_many((customer_id, today) for customer_id in customer_ids)
+
+
+def invalidate_responses(customer_ids, loan_ids=None):
+    """
+    Drop the cached view-loans pages of ``customer_ids`` and the view-loan
+    bodies of ``loan_ids``. ``None`` means every loan of those customers,
+    whose bodies embed the customer (one query).
+    """
+    customer_ids = list(customer_ids)
+    if loan_ids is None:
+        loan_ids = Loan.objects.filter(customer_id__in=customer_ids).values_list('loan_id', flat=True)
+    keys = [('customer', customer_id) for customer_id in customer_ids] + [('loan', loan_id) for loan_id in loan_ids]
+    response_cache.delete_many(keys)
+    # Once more after commit: a request that read the old rows while the write
+    # was in flight may have cached them again in between
+    transaction.on_commit(partial(response_cache.delete_many, keys))
+
+
+def close_loans_ended_before(today=None, batch_size=10000):
+    """
+    Mark active loans whose ``end_date`` is before ``today`` as closed,
+    ``batch_size`` at a time (found through the partial end_date index).
+    Credit summaries already leave such loans out by date, so only the
+    cached view-loan / view-loans responses are invalidated. Returns
+    ``{'closed', 'seconds', 'loans_per_second'}``.
+    """
+    today = today or date.today()
+    started = time.perf_counter()
+    expired = Loan.objects.filter(status=Loan.STATUS_ACTIVE, end_date__lt=today).order_by()
+    closed = 0
+    while True:
+        batch = list(expired.values_list('id', 'customer_id', 'loan_id')[:batch_size])
+        if not batch:
+            break
+        pks, customer_ids, loan_ids = zip(*batch)
+        with transaction.atomic():
+            Loan.objects.filter(id__in=pks).update(status=Loan.STATUS_CLOSED)
+            invalidate_responses(set(customer_ids), loan_ids)
+        closed += len(batch)
+    seconds = time.perf_counter() - started
+    return {
+        'closed': closed,
+        'seconds': round(seconds, 3),
+        'loans_per_second': round(closed / seconds, 1) if seconds else 0.0,
+    }
+
+
+def iter_portfolio_balances(queryset=None, as_of=None, chunk_size=10000):
+    """
+    Scheduled outstanding balance of every loan, computed chunk by chunk
+    (loans paid ahead of schedule count their recorded repayments).
+
+    Yields ``(loan_pks, customer_ids, balances, payments_due)`` array tuples,
+    one per chunk of ``chunk_size`` loans, ordered by primary key.
+    """
+    as_of = as_of or date.today()
+    queryset = queryset if queryset is not None else Loan.objects.all()
+
+    last_pk = None
+    while True:
+        chunk = portfolio_balances_chunk(queryset.filter(id__gt=last_pk) if last_pk is not None else queryset,
+                                         as_of, chunk_size)
+        if chunk is None:
+            break
+        yield chunk
+        last_pk = chunk[0][-1]
+
+
+def portfolio_balances_chunk(queryset, as_of, chunk_size, lock=False):
+    """
+    The first ``chunk_size`` loans of ``queryset`` by primary key, as one
+    :func:`iter_portfolio_balances` tuple, or ``None`` if there are none.
+
+    With ``lock`` the loans stay locked until the surrounding transaction
+    ends, taken in primary key order as in :func:`lock_customers`; SQLite
+    instead takes its write lock up front with a no-op UPDATE of the chunk.
+    """
+    queryset = queryset.order_by('id')
+    if lock:
+        if connection.features.has_select_for_update:
+            queryset = queryset.select_for_update()
+        else:
+            Loan.objects.filter(id__in=queryset.values('id')[:chunk_size]).update(emis_due=F('emis_due'))
+    chunk = list(queryset.values_list(
+        'id', 'customer_id', 'loan_amount', 'interest_rate', 'tenure', 'start_date', 'emis_paid'
+    )[:chunk_size])
+    if not chunk:
+        return None
+    pks, customer_ids, amounts, rates, tenures, starts, emis_paid = zip(*chunk)
+    balances, payments_due = outstanding_balances(amounts, rates, tenures, starts, as_of, emis_paid)
+    return pks, customer_ids, balances, payments_due
+
+
+def bulk_update_rows(model, fields, rows):
+    """
+    ``QuerySet.bulk_update`` for plain column values: ``rows`` are ``(pk,
+    value, ...)`` tuples ordered like ``fields``, written with one
+    parameterized ``UPDATE`` sent through ``executemany``. Building the
+    per-object ``CASE WHEN`` expressions is what bounds ``bulk_update`` to a
+    few thousand rows per second.
+    """
+    opts = model._meta
+    quote = connection.ops.quote_name
+    assignments = ', '.join(f'{quote(opts.get_field(field).column)} = %s' for field in fields)
+    sql = f'UPDATE {quote(opts.db_table)} SET {assignments} WHERE {quote(opts.pk.column)} = %s'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*values, pk) for pk, *values in rows])
+
+
+def bulk_increment_rows(model, fields, rows):
+    """
+    Like :func:`bulk_update_rows`, but adds each value to the column instead
+    of overwriting it, so concurrent increments never lose an update.
+    """
+    opts = model._meta
+    quote = connection.ops.quote_name
+    columns = [quote(opts.get_field(field).column) for field in fields]
+    assignments = ', '.join(f'{column} = {column} + %s' for column in columns)
+    sql = f'UPDATE {quote(opts.db_table)} SET {assignments} WHERE {quote(opts.pk.column)} = %s'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*values, pk) for pk, *values in rows])
+
+
+def bulk_insert_rows(model, fields, rows):
+    """
+    Insert ``rows`` (tuples ordered like ``fields``) with one parameterized
+    ``INSERT`` sent through ``executemany``. As with :func:`bulk_update_rows`
+    the values are plain column values: no model instances are built, so
+    dates and timestamps must already be adapted (``connection.ops.
+    adapt_datefield_value`` and friends). No primary keys are returned.
+    """
+    opts = model._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(opts.get_field(field).column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f'INSERT INTO {quote(opts.db_table)} ({columns}) VALUES ({placeholders})'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def customer_debt():
+    """``current_debt`` expression: the sum of the customer's loan balances."""
+    return Coalesce(Subquery(
+        Loan.objects.filter(customer_id=OuterRef('customer_id')).order_by()
+        .values('customer_id').annotate(total=Sum('outstanding_balance')).values('total')
+    ), 0)
+
+
+def recompute_portfolio(as_of=None, chunk_size=10000, fresh=False, progress=None):
+    """
+    Recompute every loan's ``emis_due`` and ``outstanding_balance``, then
+    every customer's ``current_debt`` (the sum over their loans), as of
+    ``as_of``.
+
+    Loans are read chunk by chunk with :func:`portfolio_balances_chunk` and
+    written with :func:`bulk_update_rows` in the same transaction, under the
+    chunk's row locks, so a repayment batch cannot commit in between and be
+    overwritten; debts are summed in SQL, one locked customer ID range per
+    ``UPDATE``. Every chunk commits together with the job's checkpoint, so an interrupted run for the same day resumes after the
+    last committed chunk unless ``fresh``. ``progress(job)`` is called after
+    each committed chunk. Returns the :class:`PortfolioRecomputeJob`.
+    """
+    as_of = as_of or date.today()
+    job = None if fresh else (PortfolioRecomputeJob.objects.filter(as_of=as_of)
+                              .exclude(status=PortfolioRecomputeJob.STATUS_DONE).first())
+    if job is None:
+        job = PortfolioRecomputeJob.objects.create(as_of=as_of, chunk_size=chunk_size)
+    else:
+        job.status = PortfolioRecomputeJob.STATUS_RUNNING
+        job.error = ''
+        job.save(update_fields=['status', 'error'])
+
+    started = time.perf_counter()
+    previous_seconds = job.seconds
+
+    def checkpoint(**fields):
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.seconds = previous_seconds + time.perf_counter() - started
+        job.save(update_fields=[*fields, 'seconds'])
+
+    try:
+        while True:
+            with transaction.atomic():
+                chunk = portfolio_balances_chunk(Loan.objects.filter(id__gt=job.last_loan_pk), as_of,
+                                                 job.chunk_size, lock=True)
+                if chunk is None:
+                    break
+                pks, _, balances, payments_due = chunk
+                rows = [(pk, due, round(balance)) for pk, due, balance in zip(pks, payments_due.tolist(), balances.tolist())]
+                bulk_update_rows(Loan, ['emis_due', 'outstanding_balance'], rows)
+                checkpoint(last_loan_pk=pks[-1], loans=job.loans + len(rows))
+            if progress is not None:
+                progress(job)
+
+        debt = customer_debt()
+        last_customer_id = Customer.objects.aggregate(Max('customer_id'))['customer_id__max'] or 0
+        while job.last_customer_id < last_customer_id:
+            upper = job.last_customer_id + job.chunk_size
+            customers = Customer.objects.filter(customer_id__gt=job.last_customer_id, customer_id__lte=upper)
+            with transaction.atomic():
+                # Locked first (in order, like repayment batches), so the sums
+                # below see every repayment committed before the UPDATE runs
+                if connection.features.has_select_for_update:
+                    list(customers.order_by('customer_id').select_for_update().values_list('customer_id', flat=True))
+                updated = customers.update(current_debt=debt)
+                checkpoint(last_customer_id=upper, customers=job.customers + updated)
+            if progress is not None:
+                progress(job)
+    except Exception as e:
+        checkpoint(status=PortfolioRecomputeJob.STATUS_FAILED, error=str(e))
+        raise
+
+    checkpoint(status=PortfolioRecomputeJob.STATUS_DONE, finished_at=timezone.now())
+    return job
+
+
+def active_loans_queryset(customer_id, today=None):
+    """
+    A customer's loans running today, as ``view-loans`` rows, ordered by ``id``
+    for keyset pagination.
+
+    ``repayments_left`` is computed by the database: whole months from today
+    until ``end_date`` (a month counts once its day is reached), clamped to
+    ``0..tenure``.
+    """
+    today = today or date.today()
+    months_left = (
+        (ExtractYear('end_date') - today.year) * 12
+        + ExtractMonth('end_date') - today.month
+        - Case(When(end_date__day__lt=today.day, then=Value(1)), default=Value(0), output_field=IntegerField())
+    )
+    return (
+        Loan.objects
+        .filter(customer_id=customer_id, status=Loan.STATUS_ACTIVE, start_date__lte=today, end_date__gte=today)
+        .order_by('id')
+        .values('id', 'loan_id', 'loan_amount', 'interest_rate', 'tenure',
+                monthly_installment=F('monthly_repayment'),
+                repayments_left=Greatest(Value(0), Least(F('tenure'), months_left))))
+
+
+def next_loan_id():
+    """
+    Allocate the ID of a new loan. Call it inside the transaction that
+    inserts the loan.
+
+    Loan IDs in the source sheets are plain integers, so this continues after
+    the highest one stored, or after the last ID allocated if that is higher.
+    Bumping the ``LoanIdSequence`` row locks it until commit, so concurrent
+    create-loan requests of different customers never get the same ID.
+    """
+    highest = Loan.objects.order_by('-loan_id').values('loan_id')[:1]
+    bump = {'last_value': Greatest(F('last_value'), Coalesce(Subquery(highest), Value(0))) + 1}
+    sequence = LoanIdSequence.objects.filter(pk=1)
+    if not sequence.update(**bump):
+        # The row the migration created is gone (e.g. a flushed database)
+        LoanIdSequence.objects.bulk_create([LoanIdSequence(pk=1)], ignore_conflicts=True)
+        sequence.update(**bump)
+    return sequence.values_list('last_value', flat=True).get()
+
+
+def lock_customer(customer_id):
+    """
+    Hold the customer's row lock until the surrounding transaction ends, so
+    loan decisions for one customer run one at a time. Returns ``False`` if
+    the customer does not exist.
+
+    A no-op UPDATE rather than ``select_for_update()``: SQLite ignores FOR
+    UPDATE, but a write as the transaction's first statement makes it wait
+    for the database write lock up front, before anything is read.
+    """
+    return Customer.objects.filter(customer_id=customer_id).update(approved_limit=F('approved_limit')) == 1
+
+
+def lock_customers(customer_ids):
+    """
+    :func:`lock_customer` for several customers, taking the row locks in
+    ``customer_id`` order so two transactions locking overlapping sets cannot
+    deadlock. An UPDATE locks rows in whatever order it scans them, so where
+    the backend has FOR UPDATE this is an ordered ``select_for_update()``;
+    SQLite still gets the up-front write.
+    """
+    customers = Customer.objects.filter(customer_id__in=sorted(customer_ids))
+    if connection.features.has_select_for_update:
+        list(customers.order_by('customer_id').select_for_update().values_list('customer_id', flat=True))
+    else:
+        customers.update(approved_limit=F('approved_limit'))
+
+
+def request_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def find_idempotency_record(endpoint, key):
+    return IdempotencyRecord.objects.filter(endpoint=endpoint, key=key).first()
+
+
+def save_idempotency_record(endpoint, key, data, status_code, response):
+    return IdempotencyRecord.objects.create(endpoint=endpoint, key=key, request_hash=request_hash(data),
+                                            status_code=status_code, response=response)
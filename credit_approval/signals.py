@@ -0,0 +1,35 @@
+# credit_approval/signals.py
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Customer, Loan
+from .services import invalidate_credit_scores, invalidate_responses, refresh_credit_summary
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def refresh_summary_on_loan_change(sender, instance, **kwargs):
+    # Bulk writes skip signals; the importers refresh summaries themselves
+    refresh_credit_summary(instance.customer_id_id)
+    invalidate_credit_scores([instance.customer_id_id])
+    invalidate_responses([instance.customer_id_id], [instance.loan_id])
+
+
+@receiver(post_save, sender=Customer)
+def refresh_summary_on_customer_change(sender, instance, created, **kwargs):
+    # A changed approved_limit moves utilization; new customers have no loans yet
+    if not created:
+        refresh_credit_summary(instance.customer_id)
+    invalidate_credit_scores([instance.customer_id])
+    # A new customer has no loans to look up
+    invalidate_responses([instance.customer_id], [] if created else None)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        # On the raw connection: connection setup, not queries of the request
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -1,16 +1,134 @@
 # credit_approval/tasks.py
-from celery import shared_task
-import pandas as pd
-from .models import Customer, Loan
+from celery import chain, group, shared_task
+from celery.backends.base import DisabledBackend
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import Customer, IngestJob, Loan
+from .services import close_loans_ended_before, recompute_portfolio
+from .importers import (
+    CUSTOMER_COLUMNS,
+    DEFAULT_CHUNK_SIZE,
+    LOAN_COLUMNS,
+    analyze_tables,
+    bulk_import,
+    count_rows,
+    reset_sequences,
+    stream_rows,
+)
+
+CUSTOMER_WORKBOOK = str(settings.BASE_DIR / 'customer_data.xlsx')
+LOAN_WORKBOOK = str(settings.BASE_DIR / 'loan_data.xlsx')
+
+# Chunk tasks receive the source name rather than the model so they stay JSON serializable
+SOURCES = {
+    'customers': (Customer, CUSTOMER_COLUMNS),
+    'loans': (Loan, LOAN_COLUMNS),
+}
+
+
+@shared_task(bind=True)
+def ingest_customer_data(self, path=CUSTOMER_WORKBOOK, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False):
+    # Stream customer rows from Excel and save them to Customer chunk by chunk
+    return ingest_workbook(self, Customer, path, CUSTOMER_COLUMNS, chunk_size, incremental)
+
+
+@shared_task(bind=True)
+def ingest_loan_data(self, path=LOAN_WORKBOOK, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False):
+    # Stream loan rows from Excel and save them to Loan chunk by chunk
+    return ingest_workbook(self, Loan, path, LOAN_COLUMNS, chunk_size, incremental)
+
+
+def ingest_workbook(task, model, path, columns, chunk_size, incremental=False):
+    # Only one chunk of rows/model objects is alive at a time, so peak memory
+    # does not grow with the size of the workbook
+    fields, rows = stream_rows(path, columns)
+    stats = bulk_import(model, fields, rows, chunk_size=chunk_size, incremental=incremental,
+                        progress=lambda stats: report_progress(task, stats))
+    # Rows carry their sheet IDs; as import_excel does, move the sequence past them
+    reset_sequences([model])
+    return stats
+
+
+def report_progress(task, stats):
+    if task.request.is_eager or not task.request.id or isinstance(task.backend, DisabledBackend):
+        return
+    task.update_state(state='PROGRESS', meta=dict(stats))
+
+
+def plan_chunks(total_rows, chunk_size):
+    # Inclusive 1-based sheet row ranges; data starts below the header on row 2
+    return [(start, min(start + chunk_size - 1, total_rows + 1)) for start in range(2, total_rows + 2, chunk_size)]
+
+
+def start_ingest_job(chunk_size=DEFAULT_CHUNK_SIZE, customer_path=CUSTOMER_WORKBOOK, loan_path=LOAN_WORKBOOK,
+                     incremental=False):
+    """
+    Split both workbooks into row-range chunks and fan them out across workers.
+
+    All customer chunks run as one group; the loan group only starts once
+    every customer chunk has finished, so loan foreign keys always resolve.
+    ``incremental`` upserts changed rows (see ``bulk_import``). Returns the
+    ``IngestJob`` tracking the run.
+    """
+    customer_chunks = plan_chunks(count_rows(customer_path), chunk_size)
+    loan_chunks = plan_chunks(count_rows(loan_path), chunk_size)
+    job = IngestJob.objects.create(chunk_size=chunk_size, total_chunks=len(customer_chunks) + len(loan_chunks),
+                                   incremental=incremental)
+
+    workflow = chain(
+        group(ingest_chunk.si(job.pk, 'customers', customer_path, start, stop, incremental) for start, stop in customer_chunks),
+        group(ingest_chunk.si(job.pk, 'loans', loan_path, start, stop, incremental) for start, stop in loan_chunks),
+        finish_ingest_job.si(job.pk),
+    )
+    workflow.apply_async()
+    return job
+
+
+@shared_task
+def ingest_chunk(job_id, source, path, min_row, max_row, incremental=False):
+    model, columns = SOURCES[source]
+    IngestJob.objects.filter(pk=job_id, status=IngestJob.STATUS_PENDING).update(status=IngestJob.STATUS_RUNNING)
+    try:
+        fields, rows = stream_rows(path, columns, min_row=min_row, max_row=max_row)
+        stats = bulk_import(model, fields, rows, chunk_size=max_row - min_row + 1, incremental=incremental)
+    except Exception as e:
+        IngestJob.objects.filter(pk=job_id).update(status=IngestJob.STATUS_FAILED, error=f"{source} rows {min_row}-{max_row}: {e}")
+        raise
+
+    IngestJob.objects.filter(pk=job_id).update(
+        done_chunks=F('done_chunks') + 1,
+        rows=F('rows') + stats['rows'],
+        rows_created=F('rows_created') + stats['created'],
+        rows_updated=F('rows_updated') + stats['updated'],
+        rows_unchanged=F('rows_unchanged') + stats['unchanged'],
+        chunk_seconds=F('chunk_seconds') + stats['seconds'],
+    )
+    return stats
+
+
+@shared_task
+def finish_ingest_job(job_id):
+    # Chunks insert the sheets' own customer_id / id values, which PostgreSQL
+    # sequences do not see; without this the next /register/ or /create-loan
+    # collides on the primary key
+    reset_sequences()
+    analyze_tables()
+    IngestJob.objects.filter(pk=job_id).exclude(status=IngestJob.STATUS_FAILED).update(
+        status=IngestJob.STATUS_DONE,
+        finished_at=timezone.now(),
+    )
+
 
 @shared_task
-def ingest_customer_data():
-    # Read customer data from Excel and save to Customer model
-    customer_data = pd.read_excel('ApprovalHub/customer_data.xlsx')
-    Customer.objects.bulk_create([Customer(**row) for _, row in customer_data.iterrows()])
+def close_expired_loans(batch_size=10000):
+    # Run nightly by celery beat (CELERY_BEAT_SCHEDULE); closes the loans
+    # whose end_date passed since the last run
+    return close_loans_ended_before(batch_size=batch_size)
+
 
 @shared_task
-def ingest_loan_data():
-    # Read loan data from Excel and save to Loan model
-    loan_data = pd.read_excel('ApprovalHub/loan_data.xlsx') #C:\Users\kumar\Desktop\Backend Internship Assignment\ApprovalHub\loan_data.xlsx
-    Loan.objects.bulk_create([Loan(**row) for _, row in loan_data.iterrows()])
+def recompute_portfolio_balances(chunk_size=10000):
+    # Nightly after close_expired_loans; resumes today's run if one was cut short
+    job = recompute_portfolio(chunk_size=chunk_size)
+    return {'job_id': job.id, 'loans': job.loans, 'customers': job.customers, 'seconds': round(job.seconds, 3)}
@@ -1,14 +1,22 @@
 # credit_approval/urls.py
 from django.urls import path
-from .views import  register_customer, check_eligibility,view_loan_by_loan_id,view_loans_by_customer,create_loan
+from .views import  register_customer, register_customer_batch, check_eligibility,check_eligibility_batch,view_loan_by_loan_id,view_loans_by_customer,loan_schedule,create_loan,import_data,import_job_status,cache_stats,metrics,record_repayments
 
 urlpatterns = [
 
     path('register/', register_customer, name='register-customer'),
+    path('register/batch/', register_customer_batch, name='register_customer_batch'),
     path('check-eligibility/', check_eligibility, name='check_eligibility'),
+    path('check-eligibility/batch/', check_eligibility_batch, name='check_eligibility_batch'),
     path('create-loan/', create_loan, name='create_loan'),
     path('view-loan/<int:loan_id>/',view_loan_by_loan_id , name='view_loan_by_loan_id'),
     path('view-loans/<int:customer_id>/', view_loans_by_customer, name='view_loans_by_customer'),
+    path('loan-schedule/<int:loan_id>/', loan_schedule, name='loan_schedule'),
+    path('repayments/', record_repayments, name='record_repayments'),
+    path('import-data/', import_data, name='import_data'),
+    path('import-jobs/<int:job_id>/', import_job_status, name='import_job_status'),
+    path('cache-stats/', cache_stats, name='cache_stats'),
+    path('metrics', metrics, name='metrics'),
 
     
     
@@ -1,35 +1,124 @@
 from datetime import datetime,date, timedelta
+import binascii
+import json
+import logging
 import traceback
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from itertools import islice
 from dateutil.relativedelta import relativedelta
 from django.shortcuts import render
-from django.http import HttpResponse
-from rest_framework.decorators import api_view
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework import status
+from rest_framework.utils.urls import replace_query_param
 from django.db.models import Sum
-from .models import Customer, Loan
-from .serializers import CustomerRegistrationSerializer,LoanDetailsSerializer,LoanDetailsCustomerSerializer,CheckEligibilityRequestSerializer,CheckEligibilityResponseSerializer,CreateLoanRequestSerializer,CreateLoanResponseSerializer
+from .models import IDENTITY_FIELDS, Customer, IngestJob, Loan, identity_fingerprint
+from .serializers import CustomerRegistrationSerializer,CheckEligibilityRequestSerializer,CheckEligibilityResponseSerializer,CreateLoanRequestSerializer,CreateLoanResponseSerializer,IngestJobSerializer
 from rest_framework.decorators import api_view
 
-from .tasks import ingest_customer_data, ingest_loan_data
+from .amortization import iter_schedule_blocks, level_installments
+from .importers import DEFAULT_CHUNK_SIZE
+from .loan_eligibility import approved_limits, amortized_installments, average_loan_credit_scores, evaluate_applications, interest_rate_slabs
+from .cache import MISSING, cached_response, credit_score_cache, response_cache
+from .metrics import CONTENT_TYPE, record_decisions, registry
+from .parsers import CSVParser, JSONLinesParser, JSONLParser
+from .querybudget import charge_batches, query_budget
+from .rendering import LOAN_DETAIL_COLUMNS, active_loan, loan_detail
+from .repayments import QUERIES_PER_BATCH as REPAYMENT_QUERIES_PER_BATCH, ingest_events
+from .services import (
+    active_loans_queryset,
+    find_idempotency_record,
+    get_credit_snapshot,
+    get_credit_snapshots,
+    insert_statements,
+    lock_customer,
+    next_loan_id,
+    request_hash,
+    save_idempotency_record,
+)
+from .tasks import start_ingest_job
 from django.db.models import Sum
-from django.db import models
+from django.db import IntegrityError, models, transaction
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 
+# Upper bound on applications scored by one /check-eligibility/batch/ call
+ELIGIBILITY_BATCH_LIMIT = 10000
+
+# Upper bound on customers created by one /register/batch/ call
+REGISTRATION_BATCH_LIMIT = 1000
+
+# Upper bound on events in one /repayments/ call; larger files go through
+# `manage.py ingest_repayments`
+REPAYMENT_EVENT_LIMIT = 50000
+
+# view-loans pages; ?page_size= can ask for up to the max
+VIEW_LOANS_PAGE_SIZE = 100
+VIEW_LOANS_MAX_PAGE_SIZE = 1000
+
+# Longest Idempotency-Key header create-loan accepts (IdempotencyRecord.key)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
 
 def index(request):
     return HttpResponse("Hello, world. You're at the credit_approval index.")
 
 
 
+@query_budget(1)
+@api_view(['POST'])
 def import_data(request):
-    ingest_customer_data.delay()
-    ingest_loan_data.delay()
-    return HttpResponse("Data import started")
+    try:
+        chunk_size = int(request.data.get('chunk_size', DEFAULT_CHUNK_SIZE))
+    except (TypeError, ValueError):
+        chunk_size = 0
+    if chunk_size < 1:
+        return Response({'error': 'chunk_size must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    incremental = request.data.get('incremental', False)
+    if not isinstance(incremental, bool):
+        return Response({'error': 'incremental must be true or false'}, status=status.HTTP_400_BAD_REQUEST)
+
+    job = start_ingest_job(chunk_size=chunk_size, incremental=incremental)
+    return Response(IngestJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@query_budget(0)
+@api_view(['GET'])
+def cache_stats(request):
+    # Counters are per process; sum them across workers when sizing the cache
+    return Response({
+        'credit_score': credit_score_cache.stats(),
+        'responses': response_cache.stats(),
+    }, status=status.HTTP_200_OK)
+
+
+@query_budget(0)
+def metrics(request):
+    # Plain Django view: Prometheus expects its own text format, not DRF content negotiation
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+@query_budget(1)
+@api_view(['GET'])
+def import_job_status(request, job_id):
+    try:
+        job = IngestJob.objects.get(pk=job_id)
+    except IngestJob.DoesNotExist:
+        return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(IngestJobSerializer(job).data, status=status.HTTP_200_OK)
 
 
 
+# Insert; the identity fingerprint's unique index rejects duplicates, which
+# are then confirmed with a fingerprint lookup
+@query_budget(2)
 @api_view(['POST'])
 def register_customer(request):
     if request.method == 'POST':
@@ -50,122 +139,321 @@ def register_customer(request):
 
 
 
+# One fingerprint lookup for the whole batch, then one INSERT per bulk_create
+# batch (SQLite fits 111 customers in one; PostgreSQL the whole batch)
+@query_budget(1, per_batch=1)
 @api_view(['POST'])
-def check_eligibility(request):
-    try:
-        serializer = CheckEligibilityRequestSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-
-        customer_id = serializer.validated_data['customer_id']
-        loan_amount = serializer.validated_data['loan_amount']
-        interest_rate = serializer.validated_data['interest_rate']
-        tenure = serializer.validated_data['tenure']
-
-        # Placeholder logic for credit score calculation
-        credit_score = calculate_credit_score(customer_id)
-        # if credit_score is zero then return a meaningful message response
-        if credit_score == 0:
-            return Response({'customer_id': customer_id,
-            'approval': False,
-            'message': "Credit score is zero, please try again later"}, status=status.HTTP_200_OK)
-
-        # Placeholder logic for eligibility check and interest rate correction
-        approval, corrected_interest_rate = check_loan_eligibility(customer_id, credit_score, loan_amount, interest_rate)
-        # if approval and corrected_interest_rate both are false then return a meaningful message response
-        if approval == False and corrected_interest_rate == 0:
-            return Response({'customer_id': customer_id,
-            'approval': False,
-            'message': "Loan not approved, your current loan amount is greater than approved limit"}, status=status.HTTP_200_OK)
+@parser_classes([JSONParser, JSONLinesParser, JSONLParser])
+def register_customer_batch(request):
+    # Body is a JSON array or JSON Lines of register payloads
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'error': 'Expected a list of customers'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > REGISTRATION_BATCH_LIMIT:
+        return Response({'error': f'At most {REGISTRATION_BATCH_LIMIT} customers per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+    item_serializers = [CustomerRegistrationSerializer(data=item) for item in items]
+    valid = [serializer.is_valid() for serializer in item_serializers]
+    validated = [serializer.validated_data for serializer, ok in zip(item_serializers, valid) if ok]
+
+    customers = [
+        Customer(approved_limit=int(limit), **data)
+        for data, limit in zip(validated, approved_limits([data['monthly_salary'] for data in validated]))
+    ]
+    for customer in customers:
+        customer.identity_fingerprint = identity_fingerprint(*(getattr(customer, field) for field in IDENTITY_FIELDS))
+    created = {id(customer) for customer in register_new_customers(customers)}
+
+    created_customers = iter(customers)
+    results = []
+    for index, (serializer, ok) in enumerate(zip(item_serializers, valid)):
+        if not ok:
+            results.append({'index': index, 'errors': serializer.errors})
+            continue
+        customer = next(created_customers)
+        if id(customer) not in created:
+            message = f"Customer with name {customer.first_name} {customer.last_name} already exists"
+            results.append({'index': index, 'errors': {api_settings.NON_FIELD_ERRORS_KEY: [message]}})
+            continue
+        results.append({
+            'customer_id': customer.customer_id,
+            'name': f"{customer.first_name} {customer.last_name}",
+            'age': customer.age,
+            'monthly_income': customer.monthly_salary,
+            'approved_limit': customer.approved_limit,
+            'phone_number': customer.phone_number,
+        })
 
-        # Calculate monthly installment based on corrected interest rate
-        monthly_installment = calculate_monthly_installment(loan_amount, corrected_interest_rate, tenure)
+    return Response(results, status=status.HTTP_200_OK)
+
+
+def register_new_customers(customers, attempts=3):
+    """
+    Insert the customers whose identity is not registered yet (the first of
+    any repeats within the list) and return them, with their primary keys set.
+    """
+    for attempt in range(attempts):
+        registered = set(Customer.objects.filter(
+            identity_fingerprint__in=[customer.identity_fingerprint for customer in customers]
+        ).values_list('identity_fingerprint', flat=True))
+        new_customers = []
+        for customer in customers:
+            if customer.identity_fingerprint not in registered:
+                registered.add(customer.identity_fingerprint)
+                new_customers.append(customer)
+        charge_batches(insert_statements(Customer, new_customers))
+        try:
+            with transaction.atomic():
+                Customer.objects.bulk_create(new_customers)
+        except IntegrityError:
+            # A concurrent registration took one of the fingerprints; look again
+            if attempt == attempts - 1:
+                raise
+            charge_batches()
+            continue
+        return new_customers
+
+
+# A fixed number of queries per batch of events (see repayments.QUERIES_PER_BATCH)
+@query_budget(0, per_batch=REPAYMENT_QUERIES_PER_BATCH)
+@api_view(['POST'])
+@parser_classes([JSONParser, JSONLinesParser, JSONLParser, CSVParser])
+def record_repayments(request):
+    # Body is a JSON array, JSON Lines or CSV of repayment events
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'error': 'Expected a list of repayment events'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > REPAYMENT_EVENT_LIMIT:
+        return Response({'error': f'At most {REPAYMENT_EVENT_LIMIT} events per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+    stats = ingest_events(items)
+    # Every batch transaction, retries included, runs the same queries
+    charge_batches(stats.pop('transactions'))
+    return Response(stats, status=status.HTTP_200_OK)
+
+
+# Snapshot; a missing or stale summary adds an aggregate and an upsert
+@query_budget(3)
+@api_view(['POST'])
+def check_eligibility(request):
+    serializer = CheckEligibilityRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        response_data = {
-            'customer_id': customer_id,
-            'approval': approval,
-            'interest_rate': interest_rate,
-            'corrected_interest_rate': corrected_interest_rate,
-            'tenure': tenure,
-            'monthly_installment': monthly_installment,
-        }
+    try:
+        # Customer and loan aggregates in one query, shared by scoring and eligibility
+        snapshot = get_credit_snapshot(serializer.validated_data['customer_id'])
 
-        response_serializer = CheckEligibilityResponseSerializer(response_data)
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
+        return Response(evaluate_eligibility(serializer.validated_data, snapshot), status=status.HTTP_200_OK)
 
     except Exception as e:
         return Response({'error': str(traceback.format_exc())}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-
-
-def check_loan_eligibility(customer_id, credit_score, loan_amount, interest_rate):
-    try:
-        customer = Customer.objects.get(customer_id=customer_id)
-
-        loans = Loan.objects.filter(customer_id=customer_id)
-
-        total_current_loan_amount = loans.exclude(end_date__lt=date.today()).aggregate(Sum('loan_amount'))['loan_amount__sum']
-        approved_limit = customer.approved_limit
-
-        if total_current_loan_amount is not None and total_current_loan_amount > approved_limit:
-            return False, 0  # If sum of current loans > approved limit, don't approve any loans
-
-        if credit_score > 50:
-            return True, interest_rate  # Approve loan as is
-
-        elif 50 > credit_score > 30:
-            return True, max(interest_rate, 12.0)  # Approve loans with interest rate > 12%
-
-        elif 30 > credit_score > 10:
-            return True, max(interest_rate, 16.0)  # Approve loans with interest rate > 16%
-
+# Customers with their summaries, then for stale summaries one aggregate and
+# one upsert INSERT per bulk_create batch
+@query_budget(2, per_batch=1)
+@api_view(['POST'])
+@parser_classes([JSONParser, JSONLinesParser, JSONLParser])
+def check_eligibility_batch(request):
+    # Body is a JSON array or JSON Lines of check-eligibility payloads
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'error': 'Expected a list of eligibility requests'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > ELIGIBILITY_BATCH_LIMIT:
+        return Response({'error': f'At most {ELIGIBILITY_BATCH_LIMIT} requests per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+    item_serializers = [CheckEligibilityRequestSerializer(data=item) for item in items]
+    valid = [serializer.is_valid() for serializer in item_serializers]
+
+    # Every referenced customer is loaded up front with a couple of __in queries
+    snapshot_stats = {}
+    snapshots = get_credit_snapshots(
+        (serializer.validated_data['customer_id'] for serializer, ok in zip(item_serializers, valid) if ok),
+        stats=snapshot_stats,
+    )
+    charge_batches(snapshot_stats['summary_inserts'])
+
+    # Score and price every valid item in one vectorized pass
+    evaluated = iter(evaluate_eligibility_batch(
+        [serializer.validated_data for serializer, ok in zip(item_serializers, valid) if ok], snapshots
+    ))
+
+    results = []
+    for index, (serializer, ok) in enumerate(zip(item_serializers, valid)):
+        if ok:
+            results.append(next(evaluated))
         else:
-            return False, 0  # Don't approve any loans if credit score < 10
-
-    except Exception as e:
-        print(f"Error checking loan eligibility: {str(e)}")
+            results.append({'index': index, 'errors': serializer.errors})
+
+    return Response(results, status=status.HTTP_200_OK)
+
+
+def evaluate_eligibility_batch(items, snapshots):
+    """
+    Vectorized :func:`evaluate_eligibility` over a list of validated requests.
+
+    ``snapshots`` maps customer IDs to ``get_credit_snapshots`` results.
+    Returns one response body per item, in order.
+    """
+    customers = [snapshots.get(item['customer_id']) for item in items]
+
+    def column(attr, missing):
+        values = []
+        for customer in customers:
+            value = getattr(customer, attr) if customer is not None else None
+            values.append(missing if value is None else value)
+        return values
+
+    decisions = evaluate_applications(
+        column('active_loan_sum', 0),
+        column('active_loan_count', 0),
+        column('current_loan_sum', float('nan')),
+        column('approved_limit', 0),
+        [item['loan_amount'] for item in items],
+        [item['interest_rate'] for item in items],
+        [item['tenure'] for item in items],
+    )
+
+    # Same decisions check_loan_eligibility would have counted one by one
+    decided = [customer is not None and score != 0 for customer, score in zip(customers, decisions['credit_score'])]
+    approved = int(sum(bool(ok and approval) for ok, approval in zip(decided, decisions['approval'])))
+    record_decisions(approved=approved, rejected=sum(decided) - approved)
+
+    results = []
+    for i, item in enumerate(items):
+        customer_id = item['customer_id']
+        if customers[i] is None or decisions['credit_score'][i] == 0:
+            results.append({'customer_id': customer_id,
+            'approval': False,
+            'message': "Credit score is zero, please try again later"})
+        elif not decisions['approval'][i]:
+            results.append({'customer_id': customer_id,
+            'approval': False,
+            'message': "Loan not approved, your current loan amount is greater than approved limit"})
+        else:
+            # Same field types as CheckEligibilityResponseSerializer
+            results.append({
+                'customer_id': customer_id,
+                'approval': True,
+                'interest_rate': float(item['interest_rate']),
+                'corrected_interest_rate': float(decisions['corrected_interest_rate'][i]),
+                'tenure': int(item['tenure']),
+                'monthly_installment': float(decisions['monthly_installment'][i]),
+            })
+    return results
+
+
+def evaluate_eligibility(data, snapshot):
+    """
+    Score and price one validated check-eligibility request.
+
+    ``snapshot`` is the customer from ``get_credit_snapshot`` (``None`` if the
+    customer does not exist). Returns the check-eligibility response body.
+    """
+    customer_id = data['customer_id']
+    loan_amount = data['loan_amount']
+    interest_rate = data['interest_rate']
+    tenure = data['tenure']
+
+    # Placeholder logic for credit score calculation
+    credit_score = calculate_credit_score(customer_id, snapshot=snapshot) if snapshot is not None else 0
+    # if credit_score is zero then return a meaningful message response
+    if credit_score == 0:
+        return {'customer_id': customer_id,
+        'approval': False,
+        'message': "Credit score is zero, please try again later"}
+
+    # Placeholder logic for eligibility check and interest rate correction
+    approval, corrected_interest_rate = check_loan_eligibility(customer_id, credit_score, loan_amount, interest_rate, snapshot=snapshot)
+    # if approval and corrected_interest_rate both are false then return a meaningful message response
+    if approval == False and corrected_interest_rate == 0:
+        return {'customer_id': customer_id,
+        'approval': False,
+        'message': "Loan not approved, your current loan amount is greater than approved limit"}
+
+    # Calculate monthly installment based on corrected interest rate
+    monthly_installment = calculate_monthly_installment(loan_amount, corrected_interest_rate, tenure)
+
+    response_data = {
+        'customer_id': customer_id,
+        'approval': approval,
+        'interest_rate': interest_rate,
+        'corrected_interest_rate': corrected_interest_rate,
+        'tenure': tenure,
+        'monthly_installment': monthly_installment,
+    }
+
+    return CheckEligibilityResponseSerializer(response_data).data
+
+
+def check_loan_eligibility(customer_id, credit_score, loan_amount, interest_rate, snapshot=MISSING):
+    # A snapshot passed in is trusted, None included (no such customer)
+    customer = get_credit_snapshot(customer_id) if snapshot is MISSING else snapshot
+    if customer is None:
+        return False, 0
+    try:
+        total_current_loan_amount = customer.current_loan_sum
+        if total_current_loan_amount is None:
+            total_current_loan_amount = float('nan')  # never over the limit
+
+        # Slabs: > 50 as is, 30-50 at least 12%, 10-30 at least 16%, otherwise (or over the limit) rejected
+        approved, corrected = interest_rate_slabs([credit_score], [interest_rate], [total_current_loan_amount], [customer.approved_limit])
+        if not approved[0]:
+            record_decisions(rejected=1)
+            return False, 0
+        record_decisions(approved=1)
+        return True, float(corrected[0])
+
+    except Exception:
+        logger.exception("Error checking loan eligibility for customer %s", customer_id)
+        record_decisions(rejected=1)
         return False, 0  # Default to not approving loans if an error occurs
     
 
 def calculate_monthly_installment(loan_amount, interest_rate, tenure):
     try:
-        print('loan_amount',loan_amount,'interest_rate',interest_rate,'tenure',tenure)
-        if tenure == 0:
-            raise ValueError("Tenure cannot be zero")
-
-        monthly_interest_rate = interest_rate / 12 / 100
-        num_installments = tenure
-        monthly_installment = (loan_amount * monthly_interest_rate) / (1 - (1 + monthly_interest_rate) ** -num_installments)
-        return monthly_installment
+        # 0.0 when the EMI is undefined (zero tenure or zero rate)
+        return float(amortized_installments([loan_amount], [interest_rate], [tenure])[0])
 
-    except ValueError as ve:
-        print(f"ValueError calculating monthly installment: {str(ve)}")
+    except Exception:
+        logger.exception("Error calculating monthly installment")
         return 0.0
 
-    except Exception as e:
-        print(f"Error calculating monthly installment: {str(traceback.format_exc())}")
-        return 0.0
+def calculate_credit_score(customer_id, snapshot=MISSING):
+    # Scores only change with the customer's loans or the date; loan writes invalidate the entry
+    cache_key = (customer_id, date.today())
+    credit_score = credit_score_cache.get(cache_key)
+    if credit_score is not MISSING:
+        return credit_score
 
-def calculate_credit_score(customer_id):
     try:
-        loans = Loan.objects.filter(customer_id=customer_id, end_date__gte=date.today())
+        customer = get_credit_snapshot(customer_id) if snapshot is MISSING else snapshot
+        if customer is None:
+            return 0
 
-        total_loan_amount = loans.aggregate(Sum('loan_amount'))['loan_amount__sum']
-        num_loans = loans.count()
+        credit_score = int(average_loan_credit_scores([customer.active_loan_sum or 0], [customer.active_loan_count or 0])[0])
 
-        if total_loan_amount is not None and num_loans > 0:
-            average_loan_amount = total_loan_amount / num_loans
-            return min(int((average_loan_amount / 1000) * 10), 100)
+        credit_score_cache.set(cache_key, credit_score)
+        return credit_score
 
-    except Exception as e:
-        print(f"Error calculating credit score: {str(e)}")
+    except Exception:
+        logger.exception("Error calculating credit score for customer %s", customer_id)
 
     return 0  # Default credit score if calculation fails
 
 
 #  /create-loan
+# Customer lock, stored-response lookup, snapshot (up to 3), next loan ID
+# (bump and read the sequence row), insert, summary refresh (2), stored
+# response; a stale snapshot and the refresh both upsert the summary
+@query_budget(11, max_repeats=2)
 @api_view(['POST'])
 def create_loan(request):
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        return Response({'error': f'Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters'},
+                        status=status.HTTP_400_BAD_REQUEST)
     try:
         serializer = CreateLoanRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -175,104 +463,252 @@ def create_loan(request):
         interest_rate = serializer.validated_data['interest_rate']
         tenure = serializer.validated_data['tenure']
 
-        # Placeholder logic for credit score calculation
-        credit_score = calculate_credit_score(customer_id)
-
-        # Placeholder logic for eligibility check and interest rate correction
-        approval, corrected_interest_rate = check_loan_eligibility(customer_id, credit_score, loan_amount, interest_rate)
-
-        if approval:
-            # Create a new Loan if the loan is approved
-            loan = Loan.objects.create(
-                customer_id=Customer.objects.get(customer_id=customer_id),
-                loan_amount=loan_amount,
-                tenure=tenure,
-                interest_rate=corrected_interest_rate,
-                monthly_repayment=calculate_monthly_installment(loan_amount, corrected_interest_rate, tenure),
-                emis_paid_on_time=0,  # Assuming no EMIs have been paid on time initially
-                start_date=date.today(),
-                end_date=date.today() + timedelta(days=(30 * tenure)),  # Assuming each month has 30 days
-            )
-
-            response_data = {
-                'loan_id': loan.id,
-                'customer_id': customer_id,
-                'loan_approved': True,
-                'message': 'Loan approved',
-                'monthly_installment': loan.monthly_repayment,
-            }
-        else:
-            response_data = {
-                'loan_id': None,
-                'customer_id': customer_id,
-                'loan_approved': False,
-                'message': 'Loan not approved',
-                'monthly_installment': 0.0,
-            }
-
-        response_serializer = CreateLoanResponseSerializer(response_data)
+        # Decide and insert under the customer's row lock: concurrent requests
+        # for one customer would otherwise all pass the approved_limit check
+        # against the same loans. A replayed key waits here for the original.
+        with transaction.atomic():
+            if not lock_customer(customer_id):
+                return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+            if idempotency_key is not None:
+                record = find_idempotency_record('create_loan', idempotency_key)
+                if record is not None:
+                    return replay_idempotent_response(record, serializer.validated_data)
+
+            # Customer and loan aggregates in one query, shared by scoring and eligibility
+            snapshot = get_credit_snapshot(customer_id)
+            if snapshot is None:
+                return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            # Placeholder logic for credit score calculation
+            credit_score = calculate_credit_score(customer_id, snapshot=snapshot)
+
+            # Placeholder logic for eligibility check and interest rate correction
+            approval, corrected_interest_rate = check_loan_eligibility(customer_id, credit_score, loan_amount, interest_rate, snapshot=snapshot)
+
+            if approval:
+                # Create a new Loan if the loan is approved
+                loan = Loan.objects.create(
+                    customer_id=snapshot,
+                    loan_id=next_loan_id(),
+                    loan_amount=loan_amount,
+                    tenure=tenure,
+                    interest_rate=corrected_interest_rate,
+                    monthly_repayment=calculate_monthly_installment(loan_amount, corrected_interest_rate, tenure),
+                    emis_paid_on_time=0,  # Assuming no EMIs have been paid on time initially
+                    start_date=date.today(),
+                    end_date=date.today() + timedelta(days=(30 * tenure)),  # Assuming each month has 30 days
+                    # Nothing is due yet; the nightly recompute_portfolio job keeps these current
+                    outstanding_balance=round(loan_amount),
+                )
+
+                response_data = {
+                    'loan_id': loan.loan_id,
+                    'customer_id': customer_id,
+                    'loan_approved': True,
+                    'message': 'Loan approved',
+                    'loan_amount': loan_amount,
+                    'interest_rate': corrected_interest_rate,
+                    'tenure': tenure,
+                    'monthly_installment': loan.monthly_repayment,
+                }
+            else:
+                response_data = {
+                    'loan_id': None,
+                    'customer_id': customer_id,
+                    'loan_approved': False,
+                    'message': 'Loan not approved',
+                    'loan_amount': loan_amount,
+                    'interest_rate': interest_rate,
+                    'tenure': tenure,
+                    'monthly_installment': 0.0,
+                }
+
+            response_serializer = CreateLoanResponseSerializer(response_data)
+            if idempotency_key is not None:
+                # Committed with the loan, so a retry never sees one without the other
+                save_idempotency_record('create_loan', idempotency_key, serializer.validated_data,
+                                        status.HTTP_200_OK, response_serializer.data)
         return Response(response_serializer.data, status=status.HTTP_200_OK)
 
+    except IntegrityError as e:
+        # The same key was committed first by a request holding another customer's lock
+        record = find_idempotency_record('create_loan', idempotency_key) if idempotency_key is not None else None
+        if record is not None:
+            return replay_idempotent_response(record, serializer.validated_data)
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+def replay_idempotent_response(record, data):
+    if record.request_hash != request_hash(data):
+        return Response({'error': 'Idempotency-Key was already used for a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+
 
+def loan_lookup(query_params, loan_id):
+    """
+    Filter for the ``/<loan_id>/`` endpoints. Loan IDs come from the loan
+    sheet, where they repeat across customers, so ``?customer_id=`` picks
+    one. Raises ``ValueError`` for a malformed ``customer_id``.
+    """
+    lookup = {'loan_id': loan_id}
+    customer_id = query_params.get('customer_id')
+    if customer_id is not None:
+        lookup['customer_id'] = int(customer_id)
+    return lookup
 
+
+def ambiguous_loan_error(loan_id):
+    # 409 body when more than one customer has a loan with this ID
+    return {'error': f'Loan ID {loan_id} belongs to more than one customer; pass ?customer_id= to choose one'}
+
+
+@query_budget(1)
+@cached_response('loan', 'loan_id')
 @api_view(['GET'])
 def view_loan_by_loan_id(request, loan_id):
     try:
-        loan = Loan.objects.get(loan_id=loan_id)
-        serializer = LoanDetailsSerializer({
-            'loan_id': loan.loan_id,
-            'customer': {
-                'customer_id': loan.customer_id.customer_id,
-                'first_name': loan.customer_id.first_name,
-                'last_name': loan.customer_id.last_name,
-                'phone_number': loan.customer_id.phone_number,
-                'age': loan.customer_id.age,
-            },
-            'loan_amount': loan.loan_amount,
-            'interest_rate': loan.interest_rate,
-            'monthly_installment': loan.monthly_repayment,
-            'tenure': loan.tenure,
-        })
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Loan.SharmasNotExist:
+        row = Loan.objects.values_list(*LOAN_DETAIL_COLUMNS).get(**loan_lookup(request.query_params, loan_id))
+    except ValueError:
+        return Response({'error': 'customer_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    except Loan.DoesNotExist:
         return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
-    
+    except Loan.MultipleObjectsReturned:
+        return Response(ambiguous_loan_error(loan_id), status=status.HTTP_409_CONFLICT)
+    # Same body as LoanDetailsSerializer, without building model instances
+    return Response(loan_detail(row), status=status.HTTP_200_OK)
+
 
+@query_budget(1)
+@api_view(['GET'])
+def loan_schedule(request, loan_id):
+    try:
+        loan = Loan.objects.get(**loan_lookup(request.query_params, loan_id))
+    except ValueError:
+        return Response({'error': 'customer_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    except Loan.DoesNotExist:
+        return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Loan.MultipleObjectsReturned:
+        return Response(ambiguous_loan_error(loan_id), status=status.HTTP_409_CONFLICT)
+
+    # Streamed block by block so long schedules are never held in memory at once
+    return StreamingHttpResponse(stream_schedule_json(loan), content_type='application/json')
+
+
+def stream_schedule_json(loan):
+    installment = float(level_installments([loan.loan_amount], [loan.interest_rate], [loan.tenure])[0])
+    header = json.dumps({
+        'loan_id': loan.loan_id,
+        'customer_id': loan.customer_id_id,
+        'loan_amount': loan.loan_amount,
+        'interest_rate': loan.interest_rate,
+        'tenure': loan.tenure,
+        'monthly_installment': round(installment, 2),
+        'start_date': loan.start_date.isoformat() if loan.start_date else None,
+    })
+    yield header[:-1] + ', "schedule": ['
+
+    separator = ''
+    for block in iter_schedule_blocks(loan.loan_amount, loan.interest_rate, loan.tenure, installment):
+        rows = zip(block['month'].tolist(), block['payment'].round(2).tolist(), block['principal'].round(2).tolist(),
+                   block['interest'].round(2).tolist(), block['balance'].round(2).tolist())
+        chunk = []
+        for month, payment, principal, interest, balance in rows:
+            due_date = loan.start_date + relativedelta(months=month) if loan.start_date else None
+            chunk.append(json.dumps({
+                'month': month,
+                'due_date': due_date.isoformat() if due_date else None,
+                'payment': payment,
+                'principal': principal,
+                'interest': interest,
+                'balance': balance,
+            }))
+        yield separator + ','.join(chunk)
+        separator = ','
+    yield ']}'
+
+
+# Page (or stream) of loans; an empty first page also checks the customer exists
+@query_budget(2)
+@cached_response('customer', 'customer_id')
 @api_view(['GET'])
 def view_loans_by_customer(request, customer_id):
+    loans = active_loans_queryset(customer_id)
+
+    if request.query_params.get('stream') in ('1', 'true'):
+        # A streamed response cannot turn into a 404 once it has started
+        if not Customer.objects.filter(customer_id=customer_id).exists():
+            return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+        # Every active loan, fetched with a server-side cursor and written out
+        # chunk by chunk; memory stays flat however many loans there are
+        return StreamingHttpResponse(stream_loans_json(loans), content_type='application/json')
+
     try:
-        current_date = date.today()
-        loans = Loan.objects.filter(
-            customer_id=customer_id,
-            start_date__lte=current_date,
-            end_date__gte=current_date
-        )
-
-        loan_data = []
-        for loan in loans:
-            # Calculate repayments_left based on complete months until the end date
-            remaining_months = relativedelta(loan.end_date, current_date).months
-            repayments_left = max(0, loan.tenure - remaining_months)
-
-
-
-            serializer = LoanDetailsCustomerSerializer({
-                'loan_id': loan.loan_id,
-                'loan_amount': loan.loan_amount,
-                'interest_rate': loan.interest_rate,
-                'monthly_installment': loan.monthly_repayment,
-                'tenure': loan.tenure,
-                'repayments_left': repayments_left,
-            })
-            loan_data.append(serializer.data)
+        page_size, after = parse_loans_page(request.query_params)
+    except ValueError:
+        return Response({'error': 'Invalid page_size or cursor'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(loan_data, status=status.HTTP_200_OK)
-    except Loan.SharmasNotExist:
-        return Response({'error': 'No loans found for the customer'}, status=status.HTTP_404_NOT_FOUND)
+    # Keyset pagination: seek past the last id instead of counting an offset
+    if after is not None:
+        loans = loans.filter(id__gt=after)
+    page = list(loans[:page_size + 1])
+
+    if not page and after is None and not Customer.objects.filter(customer_id=customer_id).exists():
+        return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    response = Response(active_loan.many(page[:page_size]), status=status.HTTP_200_OK)
+    if len(page) > page_size:
+        response['Link'] = next_page_link(request, page[page_size - 1])
+    return response
+
+
+def parse_loans_page(params):
+    # (page_size, id to seek past) from the query string; ValueError if malformed
+    page_size = min(int(params.get('page_size', VIEW_LOANS_PAGE_SIZE)), VIEW_LOANS_MAX_PAGE_SIZE)
+    if page_size < 1:
+        raise ValueError(f'Invalid page_size {page_size}')
+    after = decode_cursor(params['cursor']) if 'cursor' in params else None
+    return page_size, after
+
+
+def next_page_link(request, last_row):
+    next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(last_row['id']))
+    return f'<{next_url}>; rel="next"'
+
+
+def encode_cursor(loan_pk):
+    return urlsafe_b64encode(str(loan_pk).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return int(urlsafe_b64decode(cursor.encode()).decode())
+    except (TypeError, UnicodeDecodeError, binascii.Error):
+        raise ValueError(f'Invalid cursor {cursor!r}')
+
+
+def render_loans_chunk(rows):
+    # The chunk's objects as the paged response's JSONRenderer writes them,
+    # without the enclosing brackets, so streamed and paged bytes match
+    return JSONRenderer().render(active_loan.many(rows))[1:-1]
+
+
+def stream_loans_json(loans, chunk_size=VIEW_LOANS_MAX_PAGE_SIZE):
+    rows = loans.iterator(chunk_size=chunk_size)
+    yield b'['
+    separator = b''
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield separator + render_loans_chunk(chunk)
+        separator = b','
+    yield b']'
     
 
 